@@ -1,7 +1,7 @@
 from datetime import datetime
 import os
 import ssl
-from typing import List
+from typing import Any, Dict, List
 from uuid import uuid4
 
 from fastapi import APIRouter, Body, Depends, HTTPException
@@ -10,7 +10,8 @@ from pydantic import BaseModel
 from sqlmodel import Session, col, delete, select
 
 from app.api.auth import get_current_user
-from app.database import get_session
+from app.database import get_pool_status, get_session
+from app.email.outbox import get_outbox_depth
 from app.models import LDAPUser, User
 
 router = APIRouter()
@@ -26,7 +27,7 @@ class LDAPUserRead(BaseModel):
     uid: str | None
 
 @router.post("/ldap/sync")
-async def sync_ldap_users(
+def sync_ldap_users(
     creds: LDAPSyncRequest,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -117,7 +118,7 @@ async def sync_ldap_users(
         raise HTTPException(status_code=500, detail=f"LDAP Sync failed: {str(e)}")
 
 @router.get("/ldap/users", response_model=List[LDAPUserRead])
-async def search_ldap_users(
+def search_ldap_users(
     q: str = "",
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -146,3 +147,22 @@ async def search_ldap_users(
             uid=u.uid
         ) for u in users
     ]
+
+@router.get("/email-outbox", response_model=Dict[str, int])
+def get_email_outbox_depth(
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Number of emails waiting in the outbox, sent, and given up on"""
+    if not current_user.is_superadmin:
+        raise HTTPException(status_code=403, detail="Superadmin access required")
+
+    return get_outbox_depth(session)
+
+@router.get("/db-pool", response_model=Dict[str, Dict[str, Any]])
+def get_db_pool_status(current_user: User = Depends(get_current_user)):
+    """Database connections of this worker: pool usage, overflow and checkout wait times"""
+    if not current_user.is_superadmin:
+        raise HTTPException(status_code=403, detail="Superadmin access required")
+
+    return get_pool_status()
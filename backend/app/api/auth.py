@@ -1,15 +1,20 @@
 from datetime import datetime, timedelta, timezone
 import os
 from typing import Optional
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, Form, HTTPException, status
+from fastapi import APIRouter, Depends, Form, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
 from sqlmodel import Session, select, and_, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.database import get_session
-from app.models import Event, EventVisibility, Membership, Role, User
-from app.models import User
+from app.database import change_listener, get_async_session, get_session, notify, on_commit
+from app.models import Event, EventVisibility, GroupMembership, Membership, Role, User
+from app.utils.cache import LRUCache
 
 router = APIRouter()
 
@@ -27,40 +32,209 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+# Version 2 tokens carry the claims read paths need to authorize a user without loading it.
+# Older tokens (sub only) and tokens whose claims went stale are answered with a fresh one
+# in the REFRESHED_TOKEN_HEADER response header, which the frontend stores.
+TOKEN_VERSION = 2
+REFRESHED_TOKEN_HEADER = "X-Access-Token"
+
+def create_user_access_token(user: User) -> str:
+    return create_access_token(data={
+        "sub": user.email,
+        "ver": TOKEN_VERSION,
+        "uid": str(user.id),
+        "is_superadmin": user.is_superadmin,
+        "perm_version": user.perm_version
+    })
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """Claims of a valid token, None if it is invalid, expired or has no subject"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    return payload if payload.get("sub") is not None else None
+
+def refresh_stale_token(payload: dict, user: User, response: Response):
+    """Send a new token when the claims of the current one no longer match the user"""
+    if (
+        payload.get("ver") != TOKEN_VERSION
+        or payload.get("uid") != str(user.id)
+        or payload.get("is_superadmin") != user.is_superadmin
+        or payload.get("perm_version") != user.perm_version
+    ):
+        response.headers[REFRESHED_TOKEN_HEADER] = create_user_access_token(user)
+
+# Column values of recently authenticated users by token subject (email), so that most
+# requests skip the user lookup. Committed writes to a user evict it in every worker through
+# the USER_CHANGES_CHANNEL notification. A snapshot read just before such a commit can
+# still be cached after its eviction, it is then served until AUTH_USER_CACHE_TTL runs out.
+user_cache = LRUCache(
+    maxsize=int(os.getenv("AUTH_USER_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+)
+
+USER_CHANGES_CHANNEL = "auth_user_changed"
+
+def evict_cached_user(mapper, connection, target):
+    """Drop the cached snapshot of a user that was updated (banned, promoted...) or deleted"""
+    email = target.email
+    on_commit(target, lambda: user_cache.pop(email))
+    notify(connection, USER_CHANGES_CHANNEL, email)
+
+sa_event.listen(User, "after_update", evict_cached_user)
+sa_event.listen(User, "after_delete", evict_cached_user)
+change_listener.subscribe(USER_CHANGES_CHANNEL, user_cache.pop, on_reset=user_cache.clear)
+
+def get_user_by_email(email: str, session: Session) -> Optional[User]:
+    """Load a user, from the cache when possible
+
+    A cached snapshot is attached to the request session as a fresh instance, as if it
+    had just been loaded, so that the endpoints can modify it like a queried user.
+    """
+    snapshot = user_cache.get(email)
+    if snapshot is None:
+        user = session.exec(select(User).where(User.email == email)).first()
+        if user is not None:
+            user_cache.set(email, user.model_dump())
+        return user
+
+    # Both user dependencies may run in the same request
+    user = session.identity_map.get(identity_key(User, snapshot["id"]))
+    if user is None:
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        session.add(user)
+    return user
+
+def get_current_user(response: Response, token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str | None = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
+    payload = decode_access_token(token)
+    if payload is None:
         raise credentials_exception
-    user = session.exec(select(User).where(User.email == email)).first()
+    user = get_user_by_email(payload["sub"], session)
     if user is None or not user.is_active:
         raise credentials_exception
+    refresh_stale_token(payload, user, response)
     return user
 
-async def get_current_user_optional(token: Optional[str] = Depends(oauth2_scheme_optional), session: Session = Depends(get_session)):
+def get_current_user_optional(response: Response, token: Optional[str] = Depends(oauth2_scheme_optional), session: Session = Depends(get_session)):
     if not token:
         return None
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str | None = payload.get("sub")
-        if email is None:
-            return None
-    except JWTError:
+    payload = decode_access_token(token)
+    if payload is None:
         return None
     
-    user = session.exec(select(User).where(User.email == email)).first()
+    user = get_user_by_email(payload["sub"], session)
     if user and not user.is_active:
         return None
+    if user:
+        refresh_stale_token(payload, user, response)
     return user
 
+class AccessContext:
+    """Organization and group memberships of a user, loaded once per request
+
+    With `from_token` the user was built from the claims of its token and not loaded.
+    It is replaced by the stored user (None if banned or deleted) as soon as a check
+    needs more than its id, queries keyed on the id check it themselves (see
+    app.api.events.get_visibility_conditions).
+    """
+
+    def __init__(self, user: Optional[User], session: Session, from_token: bool = False):
+        self.user = user
+        self.from_token = from_token
+        self._session = session
+        self._roles: Optional[dict[UUID, Role]] = None
+        self._group_ids: Optional[set[UUID]] = None
+
+    def verify(self):
+        if self.from_token and self.user:
+            user = get_user_by_email(self.user.email, self._session)
+            self.user = user if user and user.is_active else None
+        self.from_token = False
+
+    @property
+    def is_superadmin(self) -> bool:
+        self.verify()
+        return bool(self.user and self.user.is_superadmin)
+
+    @property
+    def roles(self) -> dict[UUID, Role]:
+        """Role of the user in every organization they belong to"""
+        if self._roles is None:
+            self.verify()
+            self._roles = {}
+            if self.user:
+                memberships = self._session.exec(
+                    select(Membership.organization_id, Membership.role).where(Membership.user_id == self.user.id)
+                ).all()
+                self._roles = {org_id: role for org_id, role in memberships}
+        return self._roles
+
+    @property
+    def group_ids(self) -> set[UUID]:
+        if self._group_ids is None:
+            self.verify()
+            self._group_ids = set()
+            if self.user:
+                self._group_ids = set(self._session.exec(
+                    select(GroupMembership.group_id).where(GroupMembership.user_id == self.user.id)
+                ).all())
+        return self._group_ids
+
+    @property
+    def org_ids(self) -> list[UUID]:
+        return list(self.roles)
+
+    @property
+    def admin_org_ids(self) -> list[UUID]:
+        return [org_id for org_id, role in self.roles.items() if role == Role.ORG_ADMIN]
+
+    def role(self, org_id: UUID | str | None) -> Optional[Role]:
+        """Role of the user in an organization, None if not a member"""
+        if org_id is None:
+            return None
+        return self.roles.get(org_id if isinstance(org_id, UUID) else UUID(org_id))
+
+    def in_group(self, group_id: Optional[UUID]) -> bool:
+        return group_id is not None and group_id in self.group_ids
+
+def get_access_context(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    session: Session = Depends(get_session)
+) -> AccessContext:
+    """Access of the requesting user on read paths, anonymous without a valid token
+
+    A version 2 token is trusted for the user id without a query, unless the user is
+    cached anyway. Its other claims are only hints, see AccessContext.
+    """
+    payload = decode_access_token(token) if token else None
+    if payload is None:
+        return AccessContext(None, session)
+
+    if payload.get("ver") == TOKEN_VERSION and user_cache.get(payload["sub"]) is None:
+        user = User(
+            id=UUID(payload["uid"]),
+            email=payload["sub"],
+            is_superadmin=bool(payload.get("is_superadmin")),
+            perm_version=int(payload.get("perm_version", 0))
+        )
+        return AccessContext(user, session, from_token=True)
+
+    user = get_user_by_email(payload["sub"], session)
+    return AccessContext(user if user and user.is_active else None, session)
+
+def get_user_access_context(
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+) -> AccessContext:
+    return AccessContext(current_user, session)
+
 
 
 # ... imports ...
@@ -68,7 +242,7 @@ async def get_current_user_optional(token: Optional[str] = Depends(oauth2_scheme
 @router.get("/me")
 async def read_users_me(
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Get current user information with additional stats"""
     user_dict = current_user.model_dump()
@@ -76,13 +250,13 @@ async def read_users_me(
     # Calculate pending approvals (Superadmin only)
     pending_count = 0
     if current_user.is_superadmin:
-        pending_count = session.exec(
+        pending_count = (await session.exec(
             select(func.count(Event.id)).where(Event.visibility == EventVisibility.PUBLIC_PENDING) #pyright: ignore
-        ).first()
+        )).first()
         
     # Calculate rejected events (My events)
     # Events created by user
-    user_rejected = session.exec(
+    user_rejected = (await session.exec(
         select(func.count(Event.id)) #pyright: ignore
         .distinct()
         .outerjoin(
@@ -98,14 +272,14 @@ async def read_users_me(
             Event.visibility == EventVisibility.PUBLIC_REJECTED,
             Event.start_time > datetime.now(timezone.utc)
         )
-    ).first()
+    )).first()
             
     user_dict["pending_approvals_count"] = pending_count
     user_dict["rejected_events_count"] = user_rejected
     return user_dict
 
 @router.put("/me")
-async def update_user_profile(
+def update_user_profile(
     facebook_link: Optional[str] = None,
     phone_number: Optional[str] = None,
     current_user: User = Depends(get_current_user),
@@ -6,7 +6,7 @@ from fastapi.responses import RedirectResponse
 from sqlmodel import Session, select
 from starlette.config import Config
 
-from app.api.auth import create_access_token
+from app.api.auth import create_user_access_token
 from app.database import get_session
 from app.models import User
 from cas import CASClient
@@ -124,7 +124,7 @@ async def callback_campus(request: Request, session: Session = Depends(get_sessi
         )
         
         # Create JWT token for our app
-        access_token = create_access_token(data={"sub": user.email})
+        access_token = create_user_access_token(user)
         
         # Redirect to frontend with token
         return RedirectResponse(
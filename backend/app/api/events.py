@@ -1,50 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, Body, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Body
 from sqlmodel import Session, select, and_, or_, col, func, text
+from sqlalchemy import tuple_
 from sqlalchemy.dialects.postgresql import INTERVAL
 from typing import List, Optional, Sequence, cast
 from datetime import datetime, timezone
+import base64
+import json
 import os
 from uuid import UUID
-from app.database import get_session
+from app.database import get_read_session, get_session
 from app.models import (
     Event, User, Membership, Role, Organization, EventVisibility, 
     Group, GroupMembership, EventTag, Tag, EventReaction, EventLink, EventGuestOrganization
 )
-from app.api.auth import get_current_user, get_current_user_optional
+from app.api.auth import (
+    AccessContext, get_access_context, get_current_user, get_user_access_context
+)
+from app.api.notifications import schedule_event_reminders
 from app.schemas import (
     EventRead, CreateEvent, UpdateEvent, RejectEventRequest, Message, TagRead, OrganizationRead,
     ReactionSummary, ReactionDetail, UserPublicRead, PaginatedResponse
 )
-from app.email.utils import send_email, render_email_template
+from app.email.outbox import queue_email
+from app.email.utils import render_email_template
 
 router = APIRouter()
 
-def get_org_membership(user: User, org_id, session: Session) -> Optional[Membership]:
-    """Get membership for user in organization"""
-    if not user:
-        return None
-    return session.exec(
-        select(Membership).where(
-            Membership.user_id == user.id,
-            Membership.organization_id == org_id
-        )
-    ).first()
-
-def can_view_event(event: Event, user: Optional[User], session: Session) -> tuple[bool, str]:
+def can_view_event(event: Event, access: AccessContext) -> tuple[bool, str]:
     """Check if user can view an event based on visibility"""
     
     # PUBLIC_APPROVED: anyone can see
     if event.visibility == EventVisibility.PUBLIC_APPROVED:
         return True, ""
 
+    role = access.role(event.organization_id)
+    user = access.user
     if not user:
         return False, "You are not logged in"
         
-    membership = get_org_membership(user, event.organization_id, session)
-    is_super = user.is_superadmin
-    is_admin = membership and membership.role == Role.ORG_ADMIN
-    is_member = (membership and membership.role in [Role.ORG_ADMIN, Role.ORG_MEMBER]) or False
-    is_in_org = membership is not None
+    is_super = access.is_superadmin
+    is_admin = role == Role.ORG_ADMIN
+    is_in_org = role is not None
 
     if is_admin or is_super:
         return True, ""
@@ -60,13 +56,7 @@ def can_view_event(event: Event, user: Optional[User], session: Session) -> tupl
             return True, ""
             
         if event.group_id:
-            group_membership = session.exec(
-                select(GroupMembership).where(
-                    GroupMembership.group_id == event.group_id,
-                    GroupMembership.user_id == user.id
-                )
-            ).first()
-            if group_membership:
+            if access.in_group(event.group_id):
                 return True, ""
         else:
             return is_in_org, "You are not part of the organization"
@@ -75,28 +65,32 @@ def can_view_event(event: Event, user: Optional[User], session: Session) -> tupl
     
     return False, "You are not authorized to view this event"
 
-def can_edit_event(event: Event, user: User, session: Session) -> tuple[bool, str]:
+def can_edit_event(event: Event, access: AccessContext) -> tuple[bool, str]:
     """Check if user can edit an event"""
+    user = access.user
+    if not user:
+        return False, "You are not logged in"
+
     if user.is_superadmin:
         return True, ""
 
     if event.end_time < datetime.now():
         return False, "Event is in the past"
         
-    membership = get_org_membership(user, event.organization_id, session)
-    if not membership:
+    role = access.role(event.organization_id)
+    if not role:
         return False, "You are not a member of the organization"
         
     # Org Admins can edit everything
-    if membership.role == Role.ORG_ADMIN:
+    if role == Role.ORG_ADMIN:
         return True, ""
         
     # Org Members can edit everything EXCEPT Private (unless author)
-    if membership.role == Role.ORG_MEMBER and event.created_by_id == user.id:
+    if role == Role.ORG_MEMBER and event.created_by_id == user.id:
         return True, ""
-    elif membership.role == Role.ORG_MEMBER and event.visibility == EventVisibility.PRIVATE:
+    elif role == Role.ORG_MEMBER and event.visibility == EventVisibility.PRIVATE:
         return False, "You are not authorized to edit this private event, only the author and the admins can edit it"
-    elif membership.role == Role.ORG_MEMBER:
+    elif role == Role.ORG_MEMBER:
         return True, ""
         
     # Viewers (or others) cannot edit
@@ -106,6 +100,7 @@ def can_edit_event(event: Event, user: User, session: Session) -> tuple[bool, st
 def create_event(
     event_data: CreateEvent,
     current_user: User = Depends(get_current_user),
+    access: AccessContext = Depends(get_user_access_context),
     session: Session = Depends(get_session)
 ):
     """Create a new event"""
@@ -129,8 +124,7 @@ def create_event(
             
     # Check permissions
     if not current_user.is_superadmin:
-        membership = get_org_membership(current_user, UUID(event_data.organization_id), session)
-        if not membership or membership.role not in [Role.ORG_ADMIN, Role.ORG_MEMBER]:
+        if access.role(event_data.organization_id) not in [Role.ORG_ADMIN, Role.ORG_MEMBER]:
             raise HTTPException(status_code=403, detail="Not authorized to create events")
     
     # Enforce visibility flow
@@ -200,15 +194,17 @@ def create_event(
         session.add(new_link)
 
     session.commit()
+    schedule_event_reminders(session, new_event.id)
     session.refresh(new_event)
     
     session.refresh(new_event)
     
-    return new_event.to_read_model(current_user, session)
+    return new_event.to_read_model(current_user, session, access)
 
 @router.get("/drafts", response_model=List[EventRead])
 def list_drafts(
     current_user: User = Depends(get_current_user),
+    access: AccessContext = Depends(get_user_access_context),
     session: Session = Depends(get_session)
 ):
     """Get all draft events visible to the user"""
@@ -222,14 +218,7 @@ def list_drafts(
     user_drafts = cast(List[Event], user_drafts)
     
     # Get drafts from organizations where user is admin
-    admin_memberships = session.exec(
-        select(Membership).where(
-            Membership.user_id == current_user.id,
-            Membership.role == Role.ORG_ADMIN
-        )
-    ).all()
-    
-    org_ids = [m.organization_id for m in admin_memberships]
+    org_ids = access.admin_org_ids
     
     org_drafts: List[Event] = []
     if org_ids:
@@ -242,7 +231,7 @@ def list_drafts(
         ).all()
     
     drafts = user_drafts + org_drafts
-    return [event.to_read_model(current_user, session) for event in drafts]
+    return EventRead.from_models(drafts, current_user, session, access)
 
 def apply_common_filters(
     query, 
@@ -290,79 +279,118 @@ def apply_common_filters(
         
     return query
 
-def get_visibility_conditions(current_user: Optional[User], session: Session):
+def get_visibility_conditions(access: AccessContext):
     """Build the complex visibility conditions based on user role and memberships"""
-    # TODO: Use some join statements to make this more efficient
+    current_user = access.user
     # 1. Base public visibility
     conditions = [
             Event.visibility == EventVisibility.PUBLIC_APPROVED
     ]
     
-    if current_user and current_user.is_superadmin:
+    if access.from_token and current_user:
+        # The user only comes from token claims: check in the same statement that it is
+        # still active, and still a superadmin for pending events
+        is_active_user = select(User.id).where(User.id == current_user.id, col(User.is_active)).exists()
+        is_superadmin = select(User.id).where(User.id == current_user.id, col(User.is_superadmin)).exists()
+        conditions.append(and_(Event.visibility == EventVisibility.PUBLIC_PENDING, is_superadmin)) # pyright: ignore
+    elif current_user and current_user.is_superadmin:
         conditions= [Event.visibility.in_([EventVisibility.PUBLIC_APPROVED, EventVisibility.PUBLIC_PENDING])] # pyright: ignore
     elif not current_user:
         return or_(*conditions)
 
+    # Memberships are matched with correlated EXISTS subqueries keyed on the user id,
+    # so the statement stays the same whatever the number of memberships
+    is_org_member = select(Membership.id).where(
+        Membership.user_id == current_user.id,
+        Membership.organization_id == Event.organization_id
+    ).exists()
+    is_org_admin = select(Membership.id).where(
+        Membership.user_id == current_user.id,
+        Membership.organization_id == Event.organization_id,
+        Membership.role == Role.ORG_ADMIN
+    ).exists()
+    is_admin_anywhere = select(Membership.id).where(
+        Membership.user_id == current_user.id,
+        Membership.role == Role.ORG_ADMIN
+    ).exists()
+    is_group_member = select(GroupMembership.id).where(
+        GroupMembership.user_id == current_user.id,
+        GroupMembership.group_id == Event.group_id
+    ).exists()
 
     # 2. Own events (always visible to creator)
     conditions.append(and_(Event.created_by_id == current_user.id, Event.visibility == EventVisibility.PRIVATE)) # pyright: ignore
     
     # 3. Organization Memberships
-    # Fetch all memberships for the user to determine access
-    org_memberships = session.exec(
-        select(Membership).where(Membership.user_id == current_user.id)
-    ).all()
+    # Access to drafts/pending/rejected for any member
+    conditions.append(
+        and_( # pyright: ignore
+            col(Event.visibility).in_([
+                EventVisibility.DRAFT, 
+                EventVisibility.PUBLIC_PENDING, 
+                EventVisibility.PUBLIC_REJECTED
+            ]),
+            is_org_member
+        )
+    )
     
-    if org_memberships:
-        org_ids = [m.organization_id for m in org_memberships]
-        
-        # Access to drafts/pending/rejected for any member
-        conditions.append(
-            and_( # pyright: ignore
-                col(Event.organization_id).in_(org_ids),
-                col(Event.visibility).in_([
-                    EventVisibility.DRAFT, 
-                    EventVisibility.PUBLIC_PENDING, 
-                    EventVisibility.PUBLIC_REJECTED
-                ])
-            )
+    # Access to Private events (Org Admins only)
+    conditions.append(
+        and_( # pyright: ignore
+            Event.visibility == EventVisibility.PRIVATE,
+            is_org_admin
         )
-        
-        # Access to Private events (Org Admins only)
-        admin_org_ids = [m.organization_id for m in org_memberships if m.role == Role.ORG_ADMIN]
-        if admin_org_ids:
-            conditions.append(
-                and_( # pyright: ignore
-                    Event.visibility == EventVisibility.PRIVATE,
-                    col(Event.organization_id).in_(admin_org_ids)
-                )
-            )
-        else:
-            # If the group_id is null, then the event is private to the members/viewers/admins of the organization
-            conditions.append(
-                and_( # pyright: ignore
-                    Event.visibility == EventVisibility.PRIVATE,
-                    Event.group_id == None,
-                    col(Event.organization_id).in_(org_ids)
-                )
-            )
+    )
+    # If the group_id is null, then the event is private to the members/viewers/admins of the organization
+    # (only applied to users who are not admin of any organization)
+    conditions.append(
+        and_( # pyright: ignore
+            Event.visibility == EventVisibility.PRIVATE,
+            Event.group_id == None,
+            is_org_member,
+            ~is_admin_anywhere
+        )
+    )
     
     # 4. Group Memberships (Access to Private events in groups)
-    group_memberships = session.exec(
-        select(GroupMembership).where(GroupMembership.user_id == current_user.id)
-    ).all()
-    
-    if group_memberships:
-        group_ids = [gm.group_id for gm in group_memberships]
-        conditions.append(
-            and_( # pyright: ignore
-                Event.visibility == EventVisibility.PRIVATE,
-                col(Event.group_id).in_(group_ids)
-            )
+    conditions.append(
+        and_( # pyright: ignore
+            Event.visibility == EventVisibility.PRIVATE,
+            is_group_member
         )
+    )
     
+    if access.from_token:
+        return or_(conditions[0], and_(is_active_user, or_(*conditions[1:]))) # pyright: ignore
     return or_(*conditions)
 
+def encode_event_cursor(event: Event, featured: Optional[bool]) -> str:
+    """Encode the sort key of the last event of a page into an opaque cursor"""
+    key = [event.start_time.isoformat(), str(event.id)]
+    if featured:
+        key.insert(0, event.featured)
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def apply_event_cursor(query, cursor: str, featured: Optional[bool]):
+    """Only keep events sorted after the cursor, using the same ordering as list_events"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if featured:
+            last_featured, last_start, last_id = int(key[0]), datetime.fromisoformat(key[1]), UUID(key[2])
+        else:
+            last_start, last_id = datetime.fromisoformat(key[0]), UUID(key[1])
+    except (ValueError, TypeError, IndexError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    after_start = tuple_(Event.start_time, Event.id) > tuple_(last_start, last_id)
+    if featured:
+        # Featured events are sorted by descending featured value first
+        return query.where(or_(
+            Event.featured < last_featured,
+            and_(Event.featured == last_featured, after_start)
+        ))
+    return query.where(after_start)
+
 @router.get("/", response_model=PaginatedResponse[EventRead])
 def list_events(
     page: int = 1,
@@ -373,10 +401,18 @@ def list_events(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     featured: Optional[bool] = None,
-    current_user: Optional[User] = Depends(get_current_user_optional),
-    session: Session = Depends(get_session)
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    access: AccessContext = Depends(get_access_context),
+    session: Session = Depends(get_read_session)
 ):
-    """Get all events visible to the user (paginated)"""
+    """Get all events visible to the user (paginated)
+
+    Pages can be requested by number (`page`) or by following the `next_cursor`
+    of the previous response (`cursor`), which avoids scanning skipped rows.
+    The total count (and number of pages) costs a count over every matching event,
+    it is only computed with `include_total=true`.
+    """
     query = select(Event)
     
     # Apply standard filters (dates, search, etc.)
@@ -386,35 +422,50 @@ def list_events(
     
 
     # Apply Visibility Security Logic
-    visibility_cond = get_visibility_conditions(current_user, session)
+    visibility_cond = get_visibility_conditions(access)
     if visibility_cond is not None:
         query = query.where(visibility_cond)
     
     # Execute Count Query
-    count_query = select(func.count()).select_from(query.subquery())
-    total = session.exec(count_query).one()
-    # Apply Ordering
+    total = None
+    pages = None
+    if include_total:
+        count_query = select(func.count()).select_from(query.subquery())
+        total = session.exec(count_query).one()
+        pages = (total + size - 1) // size if size > 0 else 0
+
+    # Apply Ordering (the id breaks ties so that cursors are stable)
     if featured:
          # Prioritize featured events value if asking for them
-         query = query.order_by(Event.featured.desc(), Event.start_time.asc()) #pyright: ignore
+         query = query.order_by(Event.featured.desc(), Event.start_time.asc(), Event.id.asc()) #pyright: ignore
     else:
-         query = query.order_by(Event.start_time.asc()) #pyright: ignore
+         query = query.order_by(Event.start_time.asc(), Event.id.asc()) #pyright: ignore
     
     # Apply Pagination
-    events = session.exec(query.offset((page - 1) * size).limit(size)).all()
-    pages = (total + size - 1) // size if size > 0 else 0
+    if cursor:
+        query = apply_event_cursor(query, cursor, featured)
+    else:
+        query = query.offset((page - 1) * size)
+    # Fetch one extra row to know if there is a next page
+    events = list(session.exec(query.limit(size + 1)).all())
+    next_cursor = None
+    if len(events) > size:
+        events = events[:size]
+        next_cursor = encode_event_cursor(events[-1], featured) if events else None
     
     return PaginatedResponse(
-        items=[event.to_read_model(current_user, session) for event in events],
+        items=EventRead.from_models(events, access.user, session, access),
         total=total,
         page=page,
         size=size,
-        pages=pages
+        pages=pages,
+        next_cursor=next_cursor
     )
 
 @router.get("/my-events", response_model=List[EventRead])
 def list_my_events(
     current_user: User = Depends(get_current_user),
+    access: AccessContext = Depends(get_user_access_context),
     session: Session = Depends(get_session)
 ):
     """Get events the user can manage (created by user or in orgs they admin)"""
@@ -437,7 +488,7 @@ def list_my_events(
     
     all_events = session.exec(query).all()
     
-    return [e.to_read_model(current_user, session) for e in all_events]
+    return EventRead.from_models(all_events, current_user, session, access)
         
 
 @router.get("/pending-approvals", response_model=List[EventRead])
@@ -453,7 +504,7 @@ def list_pending_approvals(
         select(Event).where(Event.visibility == EventVisibility.PUBLIC_PENDING)
     ).all()
     
-    return [e.to_read_model(current_user, session) for e in pending_events]
+    return EventRead.from_models(pending_events, current_user, session)
 
 @router.get("/processed-approvals", response_model=List[EventRead])
 def list_processed_approvals(
@@ -476,7 +527,7 @@ def list_processed_approvals(
         .limit(50)
     ).all()
     
-    return [e.to_read_model(current_user, session) for e in events]
+    return EventRead.from_models(events, current_user, session)
 
 
 @router.post("/{event_id}/reset-status", response_model=Message)
@@ -500,9 +551,11 @@ def reset_event_status(
     event.visibility = EventVisibility.PUBLIC_PENDING
     event.rejection_message = None
     event.approved_at = None
+    event.updated_at = datetime.now(timezone.utc)
     
     session.add(event)
     session.commit()
+    schedule_event_reminders(session, event.id)
     
     return {"message": "Event status reset to pending"}
 
@@ -511,7 +564,7 @@ def reset_event_status(
 @router.get("/{event_id}", response_model=EventRead)
 def get_event(
     event_id: str,
-    current_user: Optional[User] = Depends(get_current_user_optional),
+    access: AccessContext = Depends(get_access_context),
     session: Session = Depends(get_session)
 ):
     """Get a single event"""
@@ -520,17 +573,18 @@ def get_event(
         raise HTTPException(status_code=404, detail="Event not found")
     
     # Check visibility
-    can_view, reason = can_view_event(event, current_user, session)
+    can_view, reason = can_view_event(event, access)
     if not can_view:
         raise HTTPException(status_code=403, detail=reason)
     
-    return event.to_read_model(current_user, session)
+    return event.to_read_model(access.user, session, access)
 
 @router.put("/{event_id}", response_model=Message)
 def update_event(
     event_id: str,
     event_data: UpdateEvent,
     current_user: User = Depends(get_current_user),
+    access: AccessContext = Depends(get_user_access_context),
     session: Session = Depends(get_session)
 ):
     """Update an event"""
@@ -539,7 +593,7 @@ def update_event(
         raise HTTPException(status_code=404, detail="Event not found")
     
     # Check permissions
-    can_edit, reason = can_edit_event(event, current_user, session)
+    can_edit, reason = can_edit_event(event, access)
     if not can_edit:
         raise HTTPException(status_code=403, detail=reason)
     
@@ -660,8 +714,10 @@ def update_event(
             )
             session.add(new_link)
     
+    event.updated_at = datetime.now(timezone.utc)
     session.add(event)
     session.commit()
+    schedule_event_reminders(session, event.id)
     session.refresh(event)
     
     return {"message": "Event updated successfully"}
@@ -670,6 +726,7 @@ def update_event(
 def delete_event(
     event_id: str,
     current_user: User = Depends(get_current_user),
+    access: AccessContext = Depends(get_user_access_context),
     session: Session = Depends(get_session)
 ):
     """Delete an event"""
@@ -678,7 +735,7 @@ def delete_event(
         raise HTTPException(status_code=404, detail="Event not found")
     
     # Check permissions
-    can_edit, reason = can_edit_event(event, current_user, session)
+    can_edit, reason = can_edit_event(event, access)
     if not can_edit:
         raise HTTPException(status_code=403, detail=reason)
     
@@ -712,7 +769,6 @@ def delete_event(
 @router.post("/{event_id}/approve", response_model=Message)
 def approve_event(
     event_id: str,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
@@ -730,9 +786,11 @@ def approve_event(
     event.visibility = EventVisibility.PUBLIC_APPROVED
     event.approved_at = datetime.now(timezone.utc)
     event.rejection_message = None  # Clear any previous rejection
+    event.updated_at = datetime.now(timezone.utc)
     
     session.add(event)
     session.commit()
+    schedule_event_reminders(session, event.id)
     
     # Send email notification
     creator = session.get(User, event.created_by_id)
@@ -741,17 +799,15 @@ def approve_event(
         event_url = f"{app_base_url}/events/{event.id}"
         
         html_content = render_email_template("event_approved.html", {
-            "project_name": "Calend'INT",
             "user_name": creator.full_name or creator.email.split('@')[0],
             "event_title": event.title,
             "event_date": event.start_time.strftime("%d/%m/%Y à %H:%M"),
             "event_location": event.location or "Non spécifié",
-            "event_url": event_url,
-            "year" : datetime.now().year
+            "event_url": event_url
         })
         
-        background_tasks.add_task(
-            send_email,
+        queue_email(
+            session,
             email_to=creator.email,
             subject="Votre événement a été approuvé !",
             html_content=html_content
@@ -764,7 +820,6 @@ def approve_event(
 def reject_event(
     event_id: str,
     request: RejectEventRequest,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
@@ -782,9 +837,11 @@ def reject_event(
     event.visibility = EventVisibility.PUBLIC_REJECTED
     event.approved_at = datetime.now(timezone.utc)
     event.rejection_message = request.message
+    event.updated_at = datetime.now(timezone.utc)
     
     session.add(event)
     session.commit()
+    schedule_event_reminders(session, event.id)
     
     # Send email notification
     creator = session.get(User, event.created_by_id)
@@ -794,16 +851,14 @@ def reject_event(
         event_url = f"{app_base_url}/events/{event.id}/edit"
         
         html_content = render_email_template("event_rejected.html", {
-            "project_name": "Calend'INT",
             "user_name": creator.full_name or creator.email.split('@')[0],
             "event_title": event.title,
             "rejection_message": request.message,
-            "event_url": event_url,
-            "year": datetime.now().year
+            "event_url": event_url
         })
         
-        background_tasks.add_task(
-            send_email,
+        queue_email(
+            session,
             email_to=creator.email,
             subject="Votre événement a été refusé",
             html_content=html_content
@@ -817,6 +872,7 @@ def toggle_reaction(
     event_id: str,
     reaction_data: dict = Body(...), # Expect { "emoji": "👍" }
     current_user: User = Depends(get_current_user),
+    access: AccessContext = Depends(get_user_access_context),
     session: Session = Depends(get_session)
 ):
     """Toggle reaction on an event"""
@@ -825,7 +881,7 @@ def toggle_reaction(
         raise HTTPException(status_code=404, detail="Event not found")
     
     # Check visibility
-    can_view, reason = can_view_event(event, current_user, session)
+    can_view, reason = can_view_event(event, access)
     if not can_view:
         raise HTTPException(status_code=403, detail=reason)
     
@@ -868,6 +924,7 @@ def toggle_reaction(
 def list_reactions(
     event_id: str,
     current_user: User = Depends(get_current_user),
+    access: AccessContext = Depends(get_user_access_context),
     session: Session = Depends(get_session)
 ):
     """List detailed reactions for an event (admin/manager only)"""
@@ -876,7 +933,7 @@ def list_reactions(
         raise HTTPException(status_code=404, detail="Event not found")
     
     # Check edit permissions (usually implies admin/manager)
-    can_edit, reason = can_edit_event(event, current_user, session)
+    can_edit, reason = can_edit_event(event, access)
     if not can_edit:
         raise HTTPException(status_code=403, detail=reason)
     
@@ -901,6 +958,7 @@ def delete_user_reaction(
     event_id: str,
     user_id: str,
     current_user: User = Depends(get_current_user),
+    access: AccessContext = Depends(get_user_access_context),
     session: Session = Depends(get_session)
 ):
     """Delete a specific user's reaction (admin only)"""
@@ -909,7 +967,7 @@ def delete_user_reaction(
         raise HTTPException(status_code=404, detail="Event not found")
     
     # Check edit permissions
-    can_edit, reason = can_edit_event(event, current_user, session)
+    can_edit, reason = can_edit_event(event, access)
     if not can_edit:
         raise HTTPException(status_code=403, detail=reason)
     
@@ -957,7 +1015,7 @@ def get_overlapping_events(
         )
     ).all()
     
-    return [e.to_read_model(current_user, session) for e in overlapping]
+    return EventRead.from_models(overlapping, current_user, session)
 
 
 
@@ -1,26 +1,32 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import hashlib
+from typing import Iterator, Optional
 from uuid import UUID
 from dateutil import tz
 
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from icalendar import Calendar, Event as IcalEvent
+from sqlalchemy import Engine, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlmodel import Session, and_, col, func, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette.config import Config
 
-from app.api.auth import get_current_user
+from app.api.auth import AccessContext, get_current_user
 from app.api.events import get_visibility_conditions
-from app.database import get_session
+from app.database import get_async_read_session, get_read_engine
 from app.models import (
     Event,
     EventReaction,
     EventTag,
-    EventVisibility,
     GroupMembership,
     Membership,
     Subscription,
     User,
 )
+from app.utils.cache import LRUCache
 
 config = Config('.env')
 BASE_URL = config.get("APP_BASE_URL")
@@ -36,12 +42,173 @@ def securekey_gen(user_id: str | UUID):
 
 router = APIRouter()
 
+# Bump when the generated ICS output changes, so that clients do not keep stale feeds
+ICS_FEED_FORMAT = 1
+feed_cache = LRUCache(maxsize=int(config.get("ICS_CACHE_SIZE", default="1024")))
+ICS_STREAMING = config.get("ICS_STREAMING", cast=bool, default=False)
+ICS_STREAM_BATCH_SIZE = int(config.get("ICS_STREAM_BATCH_SIZE", default="200"))
+# Default feed window in days around now, unbounded when not set
+ICS_PAST_DAYS = config.get("ICS_PAST_DAYS", cast=int, default=None)
+ICS_FUTURE_DAYS = config.get("ICS_FUTURE_DAYS", cast=int, default=None)
+
+def get_feed_conditions(user: User, session: Session):
+    """Build the conditions selecting the events of a user's personal feed
+
+    Every source of events is a subquery keyed on the user id, so the feed is
+    selected in a single statement whatever the number of subscriptions, tagged
+    events or reactions. The subqueries are uncorrelated so that the database can
+    evaluate each of them once even though they are OR'ed together.
+    """
+    user_uuid = user.id
+
+    # 1. Organizations the user is a member of or subscribed to
+    member_org_ids = select(Membership.organization_id).where(Membership.user_id == user_uuid)
+    subscribed_org_ids = select(Subscription.organization_id).where(
+        Subscription.user_id == user_uuid,
+        col(Subscription.organization_id).is_not(None)
+    )
+
+    # 2. Subscribed Tags
+    tagged_event_ids = (
+        select(EventTag.event_id)
+        .join(Subscription, col(Subscription.tag_id) == EventTag.tag_id)
+        .where(Subscription.user_id == user_uuid)
+    )
+
+    # 3. Private Events (Group Membership)
+    group_ids = select(GroupMembership.group_id).where(GroupMembership.user_id == user_uuid)
+
+    # 4. Reacted Events
+    reacted_event_ids = select(EventReaction.event_id).where(EventReaction.user_id == user_uuid)
+
+    conditions = [
+        col(Event.organization_id).in_(member_org_ids),
+        col(Event.organization_id).in_(subscribed_org_ids),
+        col(Event.id).in_(tagged_event_ids),
+        col(Event.group_id).in_(group_ids),
+        col(Event.id).in_(reacted_event_ids),
+        # 5. Featured Events
+        Event.featured > 0
+    ]
+
+    # Apply strict visibility rules from events system to ensure consistency
+    visibility_conditions = get_visibility_conditions(AccessContext(user, session))
+    
+    return and_(
+        or_(*conditions),
+        visibility_conditions
+    )
+
+def get_feed_window(past_days: Optional[int], future_days: Optional[int]):
+    """Conditions restricting a feed to the events overlapping [now - past_days, now + future_days]"""
+    now = datetime.now(timezone.utc)
+    conditions = []
+    if past_days is not None:
+        conditions.append(Event.end_time >= now - timedelta(days=past_days))
+    if future_days is not None:
+        conditions.append(Event.start_time <= now + timedelta(days=future_days))
+    return conditions
+
+async def get_feed_version(feed_conditions, session: AsyncSession) -> str:
+    """Cheap fingerprint of a feed, changing whenever an event enters, leaves or is updated"""
+    rows = func.string_agg(
+        func.concat(Event.id, '@', Event.updated_at),
+        aggregate_order_by(literal_column("','"), Event.id)
+    )
+    fingerprint = (await session.exec(
+        select(func.md5(func.coalesce(rows, ''))).where(feed_conditions)
+    )).one()
+    return hashlib.md5(f"{ICS_FEED_FORMAT}:{BASE_URL}:{config.get('APP_TIMEZONE', default='UTC')}:{fingerprint}".encode()).hexdigest()
+
+def build_ical_event(event: Event) -> IcalEvent:
+    ievent = IcalEvent()
+    ievent.add('summary', event.title)
+    ievent.add('dtstart', event.start_time.astimezone(tz=APP_TIMEZONE))
+    ievent.add('dtend', event.end_time.astimezone(tz=APP_TIMEZONE))
+    ievent.add('dtstamp', event.created_at.astimezone(tz=APP_TIMEZONE))
+    ievent.add('uid', f'{event.id}@{BASE_URL}')
+    
+    # Build description with poster and event link
+    description_parts = []
+    if event.description:
+        description_parts.append(event.description)
+    
+    
+    # Add event link
+    event_url = f"{BASE_URL}/events/{event.id}"
+    ievent.add('url', event_url)
+    description_parts.append(f"\n\nVoir l'événement: {event_url}")
+    
+    if description_parts:
+        ievent.add('description', '\n'.join(description_parts))
+        
+    if event.location:
+        ievent.add('location', event.location)
+
+    return ievent
+
+def build_calendar_header() -> Calendar:
+    # Create iCalendar
+    cal = Calendar()
+    cal.add('prodid', '-//Calend\'INT//mxm.dk//')
+    cal.add('version', '2.0')
+    cal.add('X-WR-CALNAME', 'Calend\'INT')
+    cal.add('X-WR-TIMEZONE', config.get("APP_TIMEZONE", default="UTC"))
+    return cal
+
+def build_calendar(events) -> bytes:
+    cal = build_calendar_header()
+    for event in events:
+        cal.add_component(build_ical_event(event))
+    return cal.to_ical()
+
+CALENDAR_FOOTER = b"END:VCALENDAR\r\n"
+
+def stream_calendar(feed_conditions, bind: Engine) -> Iterator[bytes]:
+    """Write the same bytes as build_calendar, one VEVENT at a time from a server-side cursor"""
+    # The request session is closed once the response starts, so the stream uses its own
+    with Session(bind) as session:
+        header = build_calendar_header().to_ical()
+        yield header.removesuffix(CALENDAR_FOOTER)
+
+        events = session.exec(
+            select(Event)
+            .where(feed_conditions)
+            .order_by(Event.start_time, Event.id) # pyright: ignore
+            .execution_options(yield_per=ICS_STREAM_BATCH_SIZE)
+        )
+        for event in events:
+            yield build_ical_event(event).to_ical()
+
+        yield CALENDAR_FOOTER
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates or "*" in candidates
+
 @router.get("/{securekey}/{user_id}.ics")
-def export_user_calendar(securekey: str, user_id: str, session: Session = Depends(get_session)):
+async def export_user_calendar(
+    securekey: str,
+    user_id: str,
+    request: Request,
+    past_days: Optional[int] = Query(default=ICS_PAST_DAYS, ge=0),
+    future_days: Optional[int] = Query(default=ICS_FUTURE_DAYS, ge=0),
+    stream: Optional[bool] = None,
+    if_none_match: Optional[str] = Header(default=None),
+    session: AsyncSession = Depends(get_async_read_session)
+):
     """
     Export personal calendar including:
     - Events from organizations the user is a member of
     - Events from subscribed organizations
+
+    The feed is cached per user and answers conditional requests with 304 Not Modified.
+    With `stream` (default: ICS_STREAMING) uncached feeds are written event by event
+    instead of being built in memory.
+    `past_days` and `future_days` (default: ICS_PAST_DAYS / ICS_FUTURE_DAYS) bound the
+    feed to the events around now.
     """
     try:
         user_uuid = UUID(user_id)
@@ -49,7 +216,7 @@ def export_user_calendar(securekey: str, user_id: str, session: Session = Depend
         raise HTTPException(status_code=400, detail="Invalid user ID")
     
     # Check if the user exists
-    user = session.get(User, user_uuid)
+    user = await session.get(User, user_uuid)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -57,117 +224,41 @@ def export_user_calendar(securekey: str, user_id: str, session: Session = Depend
     if securekey != securekey_gen(user_id):
         raise HTTPException(status_code=401, detail="Invalid secure key")
 
-    # Get user memberships
-    # Get user membership organization IDs
-    memberships = session.exec(
-        select(Membership).where(Membership.user_id == user_uuid)
-    ).all()
-    member_org_ids = [m.organization_id for m in memberships]
-    
-    # Get user subscriptions (Orgs and Tags)
-    subscriptions = session.exec(
-        select(Subscription).where(Subscription.user_id == user_uuid)
-    ).all()
-    sub_org_ids = [s.organization_id for s in subscriptions if s.organization_id]
-    sub_tag_ids = [s.tag_id for s in subscriptions if s.tag_id]
-    
-    # Get user group memberships
-    group_memberships = session.exec(
-        select(GroupMembership).where(GroupMembership.user_id == user_uuid)
-    ).all()
-    user_group_ids = [gm.group_id for gm in group_memberships]
-    
-    # Get user reacted events
-    # We fetch event IDs where the user has any reaction
-    reacted_events = session.exec(
-        select(EventReaction).where(EventReaction.user_id == user_uuid)
-    ).all()
-    reacted_event_ids = list(set([r.event_id for r in reacted_events]))
-    # Combine Organization IDs (Membership + Subscription)
-    all_org_ids = list(set(member_org_ids + sub_org_ids))
-    
-    # Build Query Conditions
-    conditions = []
-    
-    # 1. Subscribed Organizations
-    if all_org_ids:
-        conditions.append(col(Event.organization_id).in_(all_org_ids))
-        
-    # 2. Subscribed Tags
-    if sub_tag_ids:
-        # Efficiently filter events that have any of the subscribed tags
-        # Fetch EventTag objects to safely get event_ids
-        event_tags = session.exec(
-            select(EventTag).where(col(EventTag.tag_id).in_(sub_tag_ids))
-        ).all()
-        tag_event_ids = [et.event_id for et in event_tags]
-        
-        if tag_event_ids:
-            conditions.append(col(Event.id).in_(tag_event_ids))
-            
-    # 3. Private Events (Group Membership)
-    if user_group_ids:
-        conditions.append(col(Event.group_id).in_(user_group_ids))
-            
-    # 4. Reacted Events
-    if reacted_event_ids:
-        conditions.append(col(Event.id).in_(reacted_event_ids))
-    
-    # 5. Featured Events
-    conditions.append(Event.featured > 0)
+    # Building the conditions runs no query, the sync session is only there for AccessContext
+    feed_conditions = and_(
+        get_feed_conditions(user, session.sync_session),
+        *get_feed_window(past_days, future_days)
+    )
+    etag = f'"{await get_feed_version(feed_conditions, session)}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
 
-    if not conditions:
-        events = []
-    else:
-        # Apply strict visibility rules from events system to ensure consistency
-        visibility_conditions = get_visibility_conditions(user, session)
-        
-        query = select(Event).where(
-            and_(
-                or_(*conditions),
-                visibility_conditions
-            )
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = f"attachment; filename=calendint-{user.email.split('@')[0]}.ics"
+
+    cache_key = (user_uuid, past_days, future_days)
+    cached = feed_cache.get(cache_key)
+    if cached and cached[0] == etag:
+        content = cached[1]
+    elif stream if stream is not None else ICS_STREAMING:
+        return StreamingResponse(
+            stream_calendar(feed_conditions, get_read_engine(request)),
+            media_type="text/calendar",
+            headers=headers
         )
-        events = session.exec(query).unique().all()
-    
-    # Create iCalendar
-    cal = Calendar()
-    cal.add('prodid', '-//Calend\'INT//mxm.dk//')
-    cal.add('version', '2.0')
-    cal.add('X-WR-CALNAME', 'Calend\'INT')
-    cal.add('X-WR-TIMEZONE', config.get("APP_TIMEZONE", default="UTC"))
-    
-    for event in events:
-        ievent = IcalEvent()
-        ievent.add('summary', event.title)
-        ievent.add('dtstart', event.start_time.astimezone(tz=APP_TIMEZONE))
-        ievent.add('dtend', event.end_time.astimezone(tz=APP_TIMEZONE))
-        ievent.add('dtstamp', event.created_at.astimezone(tz=APP_TIMEZONE))
-        ievent.add('uid', f'{event.id}@{BASE_URL}')
-        
-        # Build description with poster and event link
-        description_parts = []
-        if event.description:
-            description_parts.append(event.description)
-        
-        
-        # Add event link
-        event_url = f"{BASE_URL}/events/{event.id}"
-        ievent.add('url', event_url)
-        description_parts.append(f"\n\nVoir l'événement: {event_url}")
-        
-        if description_parts:
-            ievent.add('description', '\n'.join(description_parts))
-            
-        if event.location:
-            ievent.add('location', event.location)
-            
-        cal.add_component(ievent)
+    else:
+        events = (await session.exec(
+            select(Event).where(feed_conditions).order_by(Event.start_time, Event.id) # pyright: ignore
+        )).all()
+        # Building a large calendar takes a while, keep the event loop free meanwhile
+        content = await run_in_threadpool(build_calendar, events)
+        feed_cache.set(cache_key, (etag, content))
     
     return Response(
-        content=cal.to_ical(),
+        content=content,
         media_type="text/calendar",
-        headers={"Content-Disposition": f"attachment; filename=calendint-{user.email.split('@')[0]}.ics"}
+        headers=headers
     )
 
 
@@ -3,18 +3,26 @@ import json
 import logging
 import os
 
+from typing import Iterable, Optional, Sequence
+from uuid import UUID, uuid4
+
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from sqlalchemy import Interval, literal, true, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, delete, or_, select
 
 from app.api.auth import get_current_user
 from app.database import get_session
-from app.models import Event, EventVisibility, Subscription, User, UserPushToken
+from app.models import Event, EventTag, EventVisibility, NotificationSent, ScheduledReminder, Subscription, User, UserPushToken
 from app.schemas import Message, PushTokenCreate
-from pywebpush import WebPushException, webpush
+from app.utils.push import PushMessage, PushReport, PushSender
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+REMINDER = "reminder"
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+
 @router.get("/vapid-public-key")
 def get_vapid_public_key():
     return {"public_key": os.getenv("VAPID_PUBLIC_KEY")}
@@ -46,6 +54,7 @@ def subscribe_push(
     )
     session.add(new_token)
     session.commit()
+    schedule_user_reminders(session, current_user.id)
     
     return {"message": "Subscribed to push notifications"}
 
@@ -69,97 +78,187 @@ def unsubscribe_push(
         
     return {"message": "Token not found"}
 
-def _send_push_notification(subscription_info, message_body, vapid_private_key, vapid_claims):
-    try:
-        webpush(
-            subscription_info=subscription_info,
-            data=message_body,
-            vapid_private_key=vapid_private_key,
-            vapid_claims=vapid_claims
+def get_reminder_candidates(now: datetime):
+    """Select the (user, event, fire time) of every reminder still to send
+
+    A user is reminded of an upcoming approved event `notification_delay` minutes before
+    it starts, if they have a push token and are subscribed to its organization, to one
+    of its tags, or to everything. Reminders recorded in the NotificationSent ledger are
+    left out.
+    """
+    fire_at = Event.start_time - literal(timedelta(minutes=1), Interval) * User.notification_delay
+
+    event_tag_ids = select(EventTag.tag_id).where(EventTag.event_id == Event.id).correlate(Event)
+    is_subscribed = select(Subscription.id).where(
+        Subscription.user_id == User.id,
+        or_(
+            Subscription.organization_id == Event.organization_id,
+            col(Subscription.tag_id).in_(event_tag_ids),
+            Subscription.subscribe_all == True
+        )
+    ).exists()
+    has_push_token = select(UserPushToken.id).where(UserPushToken.user_id == User.id).exists()
+    already_sent = select(NotificationSent.id).where(
+        NotificationSent.user_id == User.id,
+        NotificationSent.event_id == Event.id,
+        NotificationSent.kind == REMINDER
+    ).exists()
+
+    return (
+        select(User.id, Event.id, fire_at)
+        .select_from(Event)
+        .join(User, true())
+        .where(
+            Event.start_time > now,
+            Event.visibility == EventVisibility.PUBLIC_APPROVED,
+            has_push_token,
+            is_subscribed,
+            ~already_sent
         )
-    except WebPushException as ex:
-        if ex.response and ex.response.status_code == 410:
-            pass
-        logger.error(f"WebPush Error: {ex}")
-    except Exception as e:
-        logger.error(f"Push Error: {e}")
-
-def process_notifications(session: Session):
-    cron_delay = int(os.getenv("CRON_DELAY", "900"))
+    )
+
+def schedule_reminders(session: Session, event_id: Optional[UUID] = None, user_id: Optional[UUID] = None):
+    """Rebuild the scheduled reminders of an event, of a user, or of everyone when neither is given
+
+    Called whenever the reminders of an event or a user may have changed: event
+    creation, update and moderation, subscriptions, push tokens and notification delay.
+    """
+    stale = delete(ScheduledReminder)
+    candidates = get_reminder_candidates(datetime.now(timezone.utc))
+    if event_id is not None:
+        stale = stale.where(col(ScheduledReminder.event_id) == event_id)
+        candidates = candidates.where(Event.id == event_id)
+    if user_id is not None:
+        stale = stale.where(col(ScheduledReminder.user_id) == user_id)
+        candidates = candidates.where(User.id == user_id)
+
+    session.exec(stale) # pyright: ignore
+    session.exec(
+        insert(ScheduledReminder)
+        .from_select(["user_id", "event_id", "fire_at"], candidates)
+        .on_conflict_do_nothing()
+    ) # pyright: ignore
+    session.commit()
+
+def schedule_event_reminders(session: Session, event_id: UUID):
+    schedule_reminders(session, event_id=event_id)
+
+def schedule_user_reminders(session: Session, user_id: UUID):
+    schedule_reminders(session, user_id=user_id)
+
+def pop_due_reminders(session: Session, now: datetime, limit: int) -> tuple[int, set[tuple[UUID, UUID]]]:
+    """Take up to `limit` due reminders off the schedule and claim those still valid
+
+    Rows are locked with FOR UPDATE SKIP LOCKED, so that concurrent workers pop
+    disjoint batches. Returns the number of popped rows and the claimed (user, event) pairs.
+    """
+    due = session.exec(
+        select(ScheduledReminder.user_id, ScheduledReminder.event_id)
+        .where(ScheduledReminder.fire_at <= now)
+        .order_by(ScheduledReminder.fire_at) # pyright: ignore
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not due:
+        session.commit()
+        return 0, set()
+
+    pairs = [(user_id, event_id) for user_id, event_id in due]
+    session.exec(
+        delete(ScheduledReminder).where(
+            tuple_(ScheduledReminder.user_id, ScheduledReminder.event_id).in_(pairs)
+        )
+    ) # pyright: ignore
+
+    # The event or subscription may have changed since the reminder was scheduled
+    candidates = get_reminder_candidates(now).where(tuple_(User.id, Event.id).in_(pairs))
+    valid = {(user_id, event_id) for user_id, event_id, _ in session.exec(candidates)}
+
+    claimed = claim_notifications(session, valid, REMINDER)
+    session.commit()
+    return len(due), claimed
+
+def claim_notifications(session: Session, pairs: Iterable[tuple[UUID, UUID]], kind: str) -> set[tuple[UUID, UUID]]:
+    """Record (user, event) notifications in the ledger and return those this run is the first to claim
+
+    Concurrent runs (the background loop and /cron) race on the unique constraint, so each
+    notification is claimed, and sent, by a single run.
+    """
+    now = datetime.now(timezone.utc)
+    rows = [{"id": uuid4(), "user_id": user_id, "event_id": event_id, "kind": kind, "sent_at": now} for user_id, event_id in set(pairs)]
+    if not rows:
+        return set()
+
+    result = session.exec(
+        insert(NotificationSent)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["user_id", "event_id", "kind"])
+        .returning(NotificationSent.user_id, NotificationSent.event_id)
+    ) # pyright: ignore
+    claimed = {(row.user_id, row.event_id) for row in result}
+    session.commit()
+    return claimed
+
+def prune_push_tokens(session: Session, endpoints: Sequence[str]) -> int:
+    """Delete the push tokens of subscriptions the push services reported as gone, in one statement"""
+    if not endpoints:
+        return 0
+    result = session.exec(delete(UserPushToken).where(col(UserPushToken.endpoint).in_(set(endpoints)))) # pyright: ignore
+    session.commit()
+    return result.rowcount
+
+def build_reminder_messages(session: Session, now: datetime, pairs: set[tuple[UUID, UUID]]) -> list[PushMessage]:
+    if not pairs:
+        return []
+
+    rows = session.exec(
+        select(Event, UserPushToken)
+        .join(UserPushToken, true())
+        .where(tuple_(UserPushToken.user_id, Event.id).in_(pairs))
+    ).all()
+
+    payloads = {}
+    messages = []
+
+    for event, token in rows:
+        if event.id not in payloads:
+            event_start = event.start_time.replace(tzinfo=timezone.utc) if event.start_time.tzinfo is None else event.start_time
+            minutes_until = (event_start - now).total_seconds() / 60
+            payloads[event.id] = json.dumps({
+                "title": f"Rappel: {event.title}",
+                "body": f"L'événement commence dans {int(minutes_until)} minutes" + (f" à {event.location}." if event.location else "."),
+                "icon": "/CalendINT_icon.svg",
+                "data": { "url": f"/events/{event.id}" }
+            })
+
+        try:
+            keys = json.loads(token.keys)
+        except ValueError:
+            logger.error(f"Invalid keys for push token {token.id}")
+            continue
+        messages.append(PushMessage(token.endpoint, keys, payloads[event.id]))
+
+    return messages
+
+def process_notifications(session: Session) -> PushReport:
     vapid_private_key = os.getenv("VAPID_PRIVATE_KEY")
     vapid_claims = {"sub": "mailto:" + os.getenv("ADMIN_EMAIL", "admin@example.com")}
 
     if not vapid_private_key:
         logger.warning("VAPID_PRIVATE_KEY not set")
-        return 0
+        return PushReport()
 
-    now = datetime.now(timezone.utc)
-    
-    upcoming_events = session.exec(
-        select(Event).where(
-            Event.start_time > now,
-            Event.start_time < now + timedelta(days=1),
-            Event.visibility == EventVisibility.PUBLIC_APPROVED
-        )
-    ).all()
-    
-    sent_count = 0
-    half_delay = cron_delay / 60 / 2
+    report = PushReport()
+    with PushSender(vapid_private_key, vapid_claims) as sender:
+        while True:
+            now = datetime.now(timezone.utc)
+            popped, claimed = pop_due_reminders(session, now, REMINDER_BATCH_SIZE)
+            report.merge(sender.send(build_reminder_messages(session, now, claimed)))
+            if popped < REMINDER_BATCH_SIZE:
+                break
 
-    for event in upcoming_events:
-        event_start = event.start_time.replace(tzinfo=timezone.utc) if event.start_time.tzinfo is None else event.start_time
-        minutes_until = (event_start - now).total_seconds() / 60
-        
-        lower_bound = minutes_until - half_delay
-        upper_bound = minutes_until + half_delay
-        
-        potential_users = session.exec(
-            select(User).join(UserPushToken).where(
-                User.notification_delay >= lower_bound,
-                User.notification_delay <= upper_bound
-            ).distinct()
-        ).all()
-        
-        for user in potential_users:
-            is_subscribed = session.exec(
-                select(Subscription).where(
-                    Subscription.user_id == user.id,
-                    (Subscription.organization_id == event.organization_id)
-                )
-            ).first()
-
-            if not is_subscribed:
-                for et in event.event_tags:
-                    if session.exec(
-                        select(Subscription).where(
-                            Subscription.user_id == user.id,
-                            Subscription.tag_id == et.tag_id
-                        )
-                    ).first():
-                        is_subscribed = True
-                        break
-            
-            if is_subscribed:
-                payload = json.dumps({
-                    "title": f"Rappel: {event.title}",
-                    "body": f"L'événement commence dans {int(minutes_until)} minutes" + (f" à {event.location}." if event.location else "."),
-                    "icon": "/CalendINT_icon.svg",
-                    "data": { "url": f"/events/{event.id}" }
-                })
-                
-                for token in user.push_tokens:
-                    try:
-                        _send_push_notification(
-                            { "endpoint": token.endpoint, "keys": json.loads(token.keys) },
-                            payload,
-                            vapid_private_key,
-                            vapid_claims
-                        )
-                        sent_count += 1
-                    except Exception:
-                        continue
-
-    return sent_count
+    report.pruned = prune_push_tokens(session, report.expired_endpoints)
+    return report
 
 @router.get("/cron", response_model=Message)
 def trigger_notifications_manual(
@@ -170,5 +269,5 @@ def trigger_notifications_manual(
     if not cron_key or key != cron_key:
         raise HTTPException(status_code=403, detail="Invalid cron key")
 
-    count = process_notifications(session)
-    return {"message": f"Processed {count} notifications"}
+    report = process_notifications(session)
+    return {"message": f"Processed {report}"}
@@ -5,8 +5,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi import APIRouter, Body, Depends, HTTPException
 from sqlmodel import Session, col, select
 
-from app.api.auth import get_current_user, get_current_user_optional
-from app.database import get_session
+from app.api.auth import AccessContext, get_access_context, get_current_user, get_current_user_optional
+from app.database import get_read_session, get_session
 from app.models import EventVisibility, Membership, Organization, Role, User
 from app.schemas import EventRead, OrganizationRead
 
@@ -32,7 +32,7 @@ def create_organization(
     return org.to_read_model()
 
 @router.get("/", response_model=List[OrganizationRead])
-def list_organizations(session: Session = Depends(get_session)):
+def list_organizations(session: Session = Depends(get_read_session)):
     orgs = session.exec(select(Organization).order_by(Organization.name.asc())).all() # pyright: ignore
     return [o.to_read_model() for o in orgs]
 
@@ -153,6 +153,11 @@ def update_member_role(
     # Update role
     membership.role = role
     session.add(membership)
+    # Tokens of the member carry their permissions, have them refreshed
+    member = session.get(User, membership.user_id)
+    if member:
+        member.perm_version += 1
+        session.add(member)
     session.commit()
     
     return {"message": "Role updated successfully"}
@@ -193,8 +198,8 @@ def remove_organization_member(
 @router.get("/{org_id}/events", response_model=List[EventRead])
 def get_organization_events(
     org_id: str, 
-    session: Session = Depends(get_session),
-    current_user: Optional[User] = Depends(get_current_user_optional)
+    access: AccessContext = Depends(get_access_context),
+    session: Session = Depends(get_session)
 ):
     """Get future events for an organization"""
     from app.models import Event
@@ -207,7 +212,7 @@ def get_organization_events(
         ).order_by(col(Event.start_time))
     ).all()
     
-    return [e.to_read_model(current_user, session) for e in events]
+    return EventRead.from_models(events, access.user, session, access)
 
 
 
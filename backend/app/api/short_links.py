@@ -1,17 +1,26 @@
 from datetime import datetime, timezone
+import hashlib
+import hmac
+import logging
 import os
-import random
 import string
+from threading import Lock
+import time
 from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlmodel import Session, select
+from starlette.background import BackgroundTask
+from sqlalchemy import DateTime, Engine, Integer, String, column, event as sa_event, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, func, select, update
 
-from app.api.auth import get_current_user, get_current_user_optional
-from app.api.events import can_view_event, get_org_membership
-from app.database import get_session
+from app.api.auth import SECRET_KEY, AccessContext, get_access_context, get_current_user, get_user_access_context
+from app.api.events import can_view_event
+from app.api.notifications import schedule_user_reminders
+from app.database import DB_REPLICA_STICKY_SECONDS, change_listener, engine, get_read_engine, get_session, notify, on_commit
 from app.models import (
     Event,
     EventReaction,
@@ -21,20 +30,131 @@ from app.models import (
     ShortLink,
     ShortLinkActionType,
     ShortLinkType,
+    Tag,
     User,
+    shortlink_id_seq,
 )
-from app.schemas import Message, ShortLinkCreate, ShortLinkInfo, ShortLinkRead
+from app.schemas import Message, ShortLinkCreate, ShortLinkInfo, ShortLinkRead, ShortLinkStats
+from app.utils.cache import LRUCache
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-def generate_short_id(length=3):
-    chars = string.ascii_letters + string.digits
-    return ''.join(random.choice(chars) for _ in range(length))
+# Rendered visit pages by short id, with the ids of the event, organization or tag they show
+# and the id of the link their visits count for (see ShortLink.alias_of).
+# Committed changes to those are evicted below, in every worker through the
+# SHORT_LINK_PAGES_CHANNEL notification.
+page_cache = LRUCache(
+    maxsize=int(os.getenv("SHORT_LINK_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("SHORT_LINK_CACHE_TTL", "300"))
+)
+
+class PageEvictions:
+    """Tracks evictions so that a page rendered before one is not cached after it, and
+    pages rendered right after one come from the primary while the replica catches up"""
+
+    def __init__(self):
+        self.generation = 0
+        self.primary_until = 0.0
+        self._lock = Lock()
+
+    def evict(self, item_id: UUID):
+        with self._lock:
+            self.generation += 1
+            self.primary_until = time.monotonic() + DB_REPLICA_STICKY_SECONDS
+            page_cache.pop_where(lambda short_id, page: item_id in page[1])
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            page_cache.clear()
+
+    def reads_from_primary(self) -> bool:
+        return time.monotonic() < self.primary_until
+
+    def cache(self, short_id: str, page: tuple[str, set[UUID], str], generation: int):
+        with self._lock:
+            if generation == self.generation:
+                page_cache.set(short_id, page)
+
+page_evictions = PageEvictions()
+
+SHORT_LINK_PAGES_CHANNEL = "short_link_pages_changed"
+
+def evict_short_link_pages(mapper, connection, target):
+    """Drop the cached pages showing an event, organization or tag that was updated or deleted"""
+    item_id = target.id
+    on_commit(target, lambda: page_evictions.evict(item_id))
+    notify(connection, SHORT_LINK_PAGES_CHANNEL, str(item_id))
+
+change_listener.subscribe(
+    SHORT_LINK_PAGES_CHANNEL,
+    lambda item_id: page_evictions.evict(UUID(item_id)),
+    on_reset=page_evictions.clear
+)
+
+for model in (Event, Organization, Tag):
+    sa_event.listen(model, "after_update", evict_short_link_pages)
+    sa_event.listen(model, "after_delete", evict_short_link_pages)
+
+SHORT_ID_ALPHABET = string.digits + string.ascii_letters
+SHORT_ID_MIN_LENGTH = 3
+SHORT_ID_SHUFFLE = os.getenv("SHORT_LINK_ID_SHUFFLE", "true").lower() in ("1", "true", "yes")
+SHORT_ID_ROUNDS = 4
+# Derived once at startup, so the shuffle cannot be reproduced from the source
+SHORT_ID_KEY = hmac.new(
+    os.getenv("SHORT_LINK_ID_KEY", SECRET_KEY).encode(), b"short-link-ids", hashlib.sha256
+).digest()
+
+def shuffle_short_id(value: int, length: int) -> int:
+    """Keyed bijection of the values below 62 ** length
+
+    A Feistel network with HMAC round functions permutes the values of the smallest
+    even number of bits covering the range, and values falling outside the range are
+    walked through the permutation again until they land back in it.
+    """
+    space = len(SHORT_ID_ALPHABET) ** length
+    half = ((space - 1).bit_length() + 1) // 2
+    mask = (1 << half) - 1
+    while True:
+        left, right = value >> half, value & mask
+        for i in range(SHORT_ID_ROUNDS):
+            digest = hmac.new(SHORT_ID_KEY, f"{length}:{i}:{right}".encode(), hashlib.sha256).digest()
+            left, right = right, left ^ (int.from_bytes(digest[:8], "big") & mask)
+        value = (left << half) | right
+        if value < space:
+            return value
+
+def encode_short_id(value: int) -> str:
+    """Encode a sequence value into a unique base62 short id
+
+    Values fill the 3 character ids first, then 4 characters, and so on. Within a
+    length the value is shuffled by a keyed bijection, so that consecutive links do
+    not get consecutive, guessable ids.
+    """
+    length = SHORT_ID_MIN_LENGTH
+    while value >= len(SHORT_ID_ALPHABET) ** length:
+        value -= len(SHORT_ID_ALPHABET) ** length
+        length += 1
+
+    if SHORT_ID_SHUFFLE:
+        value = shuffle_short_id(value, length)
+
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, len(SHORT_ID_ALPHABET))
+        chars.append(SHORT_ID_ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+def next_short_id(session: Session) -> str:
+    """Take the next short id from the shortlink_id_seq sequence"""
+    return encode_short_id(session.exec(select(shortlink_id_seq.next_value())).one())
 
 @router.post("/", response_model=ShortLinkRead)
 def create_short_link(
     link_data: ShortLinkCreate,
     current_user: User = Depends(get_current_user),
+    access: AccessContext = Depends(get_user_access_context),
     session: Session = Depends(get_session)
 ):
     """Create a new short link"""
@@ -46,8 +166,7 @@ def create_short_link(
         if not org:
             raise HTTPException(status_code=404, detail="Organization not found")
         # Only members can share organization links
-        membership = get_org_membership(current_user, item_id, session)
-        if not (membership or current_user.is_superadmin):
+        if not (access.role(item_id) or current_user.is_superadmin):
              raise HTTPException(status_code=403, detail="Must be a member to share organization")
              
     elif link_data.item_type == ShortLinkType.EVENT:
@@ -55,7 +174,7 @@ def create_short_link(
         if not event:
             raise HTTPException(status_code=404, detail="Event not found")
         # Check if user can see the event
-        can_view, reason = can_view_event(event, current_user, session)
+        can_view, reason = can_view_event(event, access)
         if not (can_view or current_user.is_superadmin):
              raise HTTPException(status_code=403, detail=reason)
              
@@ -69,69 +188,106 @@ def create_short_link(
         tag = session.get(Tag, item_id)
         if not tag:
              raise HTTPException(status_code=404, detail="Tag not found")
-        membership = get_org_membership(current_user, tag.organization_id, session)
-        if not (membership or current_user.is_superadmin):
+        if not (access.role(tag.organization_id) or current_user.is_superadmin):
              raise HTTPException(status_code=403, detail="Must be a member to share tag")
              
     else:
         raise HTTPException(status_code=400, detail="Invalid item type")
 
-    # 2. Check if identical link already exists
-    existing = session.exec(
-        select(ShortLink).where(
-            ShortLink.item_type == link_data.item_type,
-            ShortLink.item_id == item_id,
-            ShortLink.action_type == link_data.action_type
-        )
-    ).first()
-    
+    # 2. Create the link, or reuse the identical one (uq_shortlink_item_action)
     app_base_url = os.getenv("APP_BASE_URL", "https://cal.minet.net")
-    
-    if existing:
-        return ShortLinkRead(id=existing.id, url=f"{app_base_url}/s/{existing.id}")
-
-    # 3. Create new link
-    # Try to generate unique ID
-    for length in range(3, 8):
-        for _ in range(10): # Retry a few times
-            new_id = generate_short_id(length)
-            if not session.get(ShortLink, new_id):
-                break
-        else: # google en passant
-            continue
-        break
-    else:
-        raise HTTPException(status_code=500, detail="Failed to generate unique ID")
-
-    new_link = ShortLink(
-        id=new_id,
-        item_type=ShortLinkType(link_data.item_type),
-        action_type=ShortLinkActionType(link_data.action_type),
-        item_id=item_id,
-        created_by_id=current_user.id
+    key = (
+        ShortLink.item_type == link_data.item_type,
+        ShortLink.item_id == item_id,
+        ShortLink.action_type == link_data.action_type,
+        col(ShortLink.alias_of).is_(None)
     )
-    
-    session.add(new_link)
+    while True:
+        short_id = session.exec(
+            insert(ShortLink)
+            .values(
+                id=next_short_id(session),
+                item_type=ShortLinkType(link_data.item_type),
+                action_type=ShortLinkActionType(link_data.action_type),
+                item_id=item_id,
+                created_by_id=current_user.id,
+                created_at=datetime.now(timezone.utc),
+                last_used_at=datetime.now(timezone.utc),
+                visit_count=0
+            )
+            .on_conflict_do_nothing()
+            .returning(ShortLink.id)
+        ).scalar_one_or_none() # pyright: ignore
+        if short_id is None:
+            short_id = session.exec(select(ShortLink.id).where(*key)).first()
+        # Neither inserted nor existing: the id was drawn at random before the sequence, or
+        # shuffled with another key, take the next one
+        if short_id is not None:
+            break
     session.commit()
-    session.refresh(new_link)
-    
-    return ShortLinkRead(id=new_link.id, url=f"{app_base_url}/s/{new_link.id}")
 
-@router.get("/visit/{short_id}")
-def visit_short_link(
-    short_id: str,
-    session: Session = Depends(get_session)
-):
-    """Resolve short link and return redirect URL or action"""
-    link = session.get(ShortLink, short_id)
-    if not link:
-        raise HTTPException(status_code=404, detail="Link not found")
-    
-    # Update last used
-    link.last_used_at = datetime.now(timezone.utc)
-    session.add(link)
-    session.commit()
-    
+    return ShortLinkRead(id=short_id, url=f"{app_base_url}/s/{short_id}")
+
+class VisitBuffer:
+    """Short link visits not written to the database yet, by short id"""
+
+    def __init__(self, max_hits: int):
+        self.max_hits = max_hits
+        self._visits: dict[str, tuple[int, datetime]] = {}
+        self._hits = 0
+        self._lock = Lock()
+
+    def record(self, short_id: str, count: int = 1, at: Optional[datetime] = None) -> bool:
+        """Count visits of a link, returns whether the buffer is due for a flush"""
+        at = at or datetime.now(timezone.utc)
+        with self._lock:
+            hits, last_used_at = self._visits.get(short_id, (0, at))
+            self._visits[short_id] = (hits + count, max(last_used_at, at))
+            self._hits += count
+            return self._hits >= self.max_hits
+
+    def pending(self, short_id: str) -> int:
+        with self._lock:
+            return self._visits.get(short_id, (0, None))[0]
+
+    def take(self) -> dict[str, tuple[int, datetime]]:
+        with self._lock:
+            visits, self._visits, self._hits = self._visits, {}, 0
+            return visits
+
+visit_buffer = VisitBuffer(max_hits=int(os.getenv("SHORT_LINK_FLUSH_HITS", "500")))
+
+def flush_short_link_visits(session: Session) -> int:
+    """Write the buffered visits of every link in a single UPDATE, returns the number of links updated"""
+    visits = visit_buffer.take()
+    if not visits:
+        return 0
+
+    rows = values(
+        column("id", String), column("hits", Integer), column("last_used_at", DateTime),
+        name="visits"
+    ).data([(short_id, hits, last_used_at) for short_id, (hits, last_used_at) in visits.items()])
+    try:
+        session.exec(
+            update(ShortLink)
+            .where(col(ShortLink.id) == rows.c.id)
+            .values(
+                visit_count=col(ShortLink.visit_count) + rows.c.hits,
+                last_used_at=func.greatest(ShortLink.last_used_at, rows.c.last_used_at)
+            )
+            .execution_options(synchronize_session=False)
+        ) # pyright: ignore
+        session.commit()
+    except Exception:
+        session.rollback()
+        # Keep the visits for the next flush
+        for short_id, (hits, last_used_at) in visits.items():
+            visit_buffer.record(short_id, hits, last_used_at)
+        raise
+    return len(visits)
+
+def render_short_link_page(link: ShortLink, session: Session) -> tuple[str, set[UUID]]:
+    """Build the OG/redirect page of a short link, along with the ids of the items it shows"""
     # Determine Redirect URL
     app_base_url = os.getenv("APP_BASE_URL", "https://cal.minet.net")
     redirect_url = f"{app_base_url}"
@@ -150,6 +306,7 @@ def visit_short_link(
         redirect_url = f"{app_base_url}/consent/{link.id}"
 
     # Fetch Metadata
+    targets = {link.item_id}
     og_title = "CalendInt"
     og_description = "Calendar Integration App"
     og_image = "" # Default image?
@@ -157,6 +314,7 @@ def visit_short_link(
     if link.item_type == ShortLinkType.EVENT:
         event = session.get(Event, link.item_id)
         if event:
+             targets.add(event.organization_id)
              og_title = event.title
              if event.description:
                  og_description = event.description[:200]
@@ -178,9 +336,9 @@ def visit_short_link(
                  og_image = org.logo_url
             
     elif link.item_type == ShortLinkType.TAG:
-        from app.models import Tag
         tag = session.get(Tag, link.item_id)
         if tag:
+            targets.add(tag.organization_id)
             og_title = f"{tag.name} Subscription"
             # Tags might be part of an org
             org = session.get(Organization, tag.organization_id)
@@ -214,12 +372,101 @@ def visit_short_link(
     </html>
     """
     
-    return HTMLResponse(content=html_content, status_code=200)
+    return html_content, targets
+
+def load_short_link_page(short_id: str, bind: Engine) -> Optional[tuple[str, set[UUID], str]]:
+    """Render and cache the page of a short link, None if it does not exist"""
+    generation = page_evictions.generation
+    if page_evictions.reads_from_primary():
+        bind = engine
+    with Session(bind) as session:
+        link = session.get(ShortLink, short_id)
+        if not link:
+            return None
+        html_content, targets = render_short_link_page(link, session)
+        page = (html_content, targets, link.alias_of or link.id)
+    page_evictions.cache(short_id, page, generation)
+    return page
+
+def flush_buffered_visits() -> int:
+    with Session(engine) as session:
+        return flush_short_link_visits(session)
+
+def flush_buffered_visits_quietly():
+    """Flush from a background task, a failed flush keeps the visits for visits_loop"""
+    try:
+        flush_buffered_visits()
+    except Exception as e:
+        logger.error(f"Error flushing short link visits: {e}")
+
+@router.get("/visit/{short_id}")
+async def visit_short_link(short_id: str, request: Request):
+    """Resolve short link and return redirect URL or action
+
+    Cached pages are answered straight from the event loop, rendering a page runs
+    in the threadpool with its own session. A full visit buffer is written once
+    the response is sent, so the visitor neither waits for it nor sees its errors.
+    """
+    cached = page_cache.get(short_id)
+    if cached is None:
+        cached = await run_in_threadpool(load_short_link_page, short_id, get_read_engine(request))
+        if cached is None:
+            raise HTTPException(status_code=404, detail="Link not found")
+
+    # Counted in memory and written in bulk, see flush_short_link_visits
+    background = None
+    if visit_buffer.record(cached[2]):
+        background = BackgroundTask(flush_buffered_visits_quietly)
+    
+    return HTMLResponse(content=cached[0], status_code=200, background=background)
+
+def get_short_link_stats(link: ShortLink, session: Session) -> ShortLinkStats:
+    app_base_url = os.getenv("APP_BASE_URL", "https://cal.minet.net")
+    # The visits of an alias are counted on the link it duplicates
+    counted = (session.get(ShortLink, link.alias_of) if link.alias_of else None) or link
+    return ShortLinkStats(
+        id=link.id,
+        url=f"{app_base_url}/s/{link.id}",
+        item_type=link.item_type.value,
+        item_id=link.item_id,
+        action_type=link.action_type.value,
+        # Visits of this worker that are not flushed yet
+        visit_count=counted.visit_count + visit_buffer.pending(counted.id),
+        created_at=link.created_at,
+        last_used_at=counted.last_used_at
+    )
+
+@router.get("/stats", response_model=List[ShortLinkStats])
+def list_short_link_stats(
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Visit counts of the short links created by the current user, most visited first"""
+    links = session.exec(
+        select(ShortLink).where(ShortLink.created_by_id == current_user.id)
+    ).all()
+    stats = [get_short_link_stats(link, session) for link in links]
+    return sorted(stats, key=lambda link: link.visit_count, reverse=True)
+
+@router.get("/stats/{short_id}", response_model=ShortLinkStats)
+def get_short_link_stats_by_id(
+    short_id: str,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Visit count of a short link (creator or superadmin only)"""
+    link = session.get(ShortLink, short_id)
+    if not link:
+        raise HTTPException(status_code=404, detail="Link not found")
+    if link.created_by_id != current_user.id and not current_user.is_superadmin:
+        raise HTTPException(status_code=403, detail="Not authorized to view this link's statistics")
+
+    return get_short_link_stats(link, session)
 
 @router.get("/info/{short_id}", response_model=ShortLinkInfo)
 def get_link_info(
     short_id: str,
-    current_user: Optional[User] = Depends(get_current_user_optional),
+    access: AccessContext = Depends(get_access_context),
     session: Session = Depends(get_session)
 ):
     """Get info for confirmation page"""
@@ -239,7 +486,7 @@ def get_link_info(
         event = session.get(Event, link.item_id)
         if event:
             # Check visibility
-            can_view, reason = can_view_event(event, current_user, session)
+            can_view, reason = can_view_event(event, access)
             if not can_view:
                  raise HTTPException(status_code=403, detail=reason)
             title = event.title
@@ -292,6 +539,7 @@ def get_link_info(
 def confirm_subscription(
     short_id: str,
     current_user: User = Depends(get_current_user),
+    access: AccessContext = Depends(get_user_access_context),
     session: Session = Depends(get_session)
 ):
     """Execute the subscription action"""
@@ -344,7 +592,7 @@ def confirm_subscription(
         event = session.get(Event, link.item_id)
         if not event:
             raise HTTPException(status_code=404, detail="Event not found")
-        can_view, reason = can_view_event(event, current_user, session)
+        can_view, reason = can_view_event(event, access)
         if not can_view:
              raise HTTPException(status_code=403, detail=reason)
              
@@ -365,4 +613,6 @@ def confirm_subscription(
             session.add(reaction)
             
     session.commit()
+    if link.item_type in [ShortLinkType.ORGANIZATION, ShortLinkType.TAG]:
+        schedule_user_reminders(session, current_user.id)
     return {"message": "Success"}
@@ -6,6 +6,7 @@ from pydantic import BaseModel
 from sqlmodel import Session, select
 
 from app.api.auth import get_current_user
+from app.api.notifications import schedule_user_reminders
 from app.database import get_session
 from app.models import Organization, Subscription, Tag, User
 
@@ -16,7 +17,7 @@ class SubscriptionCreate(BaseModel):
     tag_id: str
 
 @router.get("/me")
-async def get_my_subscriptions(
+def get_my_subscriptions(
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
@@ -76,7 +77,7 @@ async def get_my_subscriptions(
     return result
 
 @router.post("/organizations/{org_id}")
-async def subscribe_to_organization(
+def subscribe_to_organization(
     org_id: str,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -105,12 +106,13 @@ async def subscribe_to_organization(
     )
     session.add(subscription)
     session.commit()
+    schedule_user_reminders(session, current_user.id)
     session.refresh(subscription)
     
     return {"message": "Subscribed successfully", "subscription_id": str(subscription.id)}
 
 @router.delete("/organizations/{org_id}")
-async def unsubscribe_from_organization(
+def unsubscribe_from_organization(
     org_id: str,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -128,11 +130,12 @@ async def unsubscribe_from_organization(
     
     session.delete(subscription)
     session.commit()
+    schedule_user_reminders(session, current_user.id)
     
     return {"message": "Unsubscribed successfully"}
 
 @router.post("/tags/{tag_id}")
-async def subscribe_to_tag(
+def subscribe_to_tag(
     tag_id: str,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -161,12 +164,13 @@ async def subscribe_to_tag(
     )
     session.add(subscription)
     session.commit()
+    schedule_user_reminders(session, current_user.id)
     session.refresh(subscription)
     
     return {"message": "Subscribed successfully", "subscription_id": str(subscription.id)}
 
 @router.delete("/tags/{tag_id}")
-async def unsubscribe_from_tag(
+def unsubscribe_from_tag(
     tag_id: str,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -184,11 +188,12 @@ async def unsubscribe_from_tag(
     
     session.delete(subscription)
     session.commit()
+    schedule_user_reminders(session, current_user.id)
     
     return {"message": "Unsubscribed successfully"}
 
 @router.post("/all")
-async def subscribe_to_all(
+def subscribe_to_all(
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
@@ -211,12 +216,13 @@ async def subscribe_to_all(
     )
     session.add(subscription)
     session.commit()
+    schedule_user_reminders(session, current_user.id)
     session.refresh(subscription)
     
     return {"message": "Subscribed to all successfully"}
 
 @router.delete("/all")
-async def unsubscribe_from_all(
+def unsubscribe_from_all(
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
@@ -233,5 +239,6 @@ async def unsubscribe_from_all(
     
     session.delete(subscription)
     session.commit()
+    schedule_user_reminders(session, current_user.id)
     
     return {"message": "Unsubscribed from all successfully"}
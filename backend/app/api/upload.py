@@ -60,7 +60,7 @@ async def upload_image(
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @router.delete("/image")
-async def delete_image(
+def delete_image(
     filename: str,
     current_user: User = Depends(get_current_user)
 ):
@@ -7,6 +7,7 @@ from sqlmodel import Session, or_, select, func
 from starlette.config import Config
 
 from app.api.auth import get_current_user
+from app.api.notifications import schedule_user_reminders
 from app.database import get_session
 from app.models import (
     Event,
@@ -20,7 +21,7 @@ from app.models import (
     User,
 )
 from app.schemas import UserPublicRead, UserRead, PaginatedResponse
-from app.utils.email import send_email
+from app.email.outbox import queue_email
 
 router = APIRouter()
 config = Config('.env')
@@ -30,6 +31,7 @@ class UserUpdate(BaseModel):
     profile_picture_url: Optional[str] = None
     phone_number: Optional[str] = None
     facebook_link: Optional[str] = None
+    notification_delay: Optional[int] = None
 
 class UserInvite(BaseModel):
     email: str
@@ -54,7 +56,7 @@ class MembershipWithOrganization(BaseModel):
         from_attributes = True
 
 @router.get("/me/organizations", response_model=List[Organization])
-async def get_user_organizations(
+def get_user_organizations(
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
@@ -74,7 +76,7 @@ async def get_user_organizations(
     return organizations
 
 @router.get("/me/memberships", response_model=List[MembershipWithOrganization])
-async def get_user_memberships(
+def get_user_memberships(
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
@@ -97,7 +99,7 @@ async def get_user_memberships(
     return result
 
 @router.get("/me/groups")
-async def get_user_groups(
+def get_user_groups(
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
@@ -129,7 +131,7 @@ async def get_user_groups(
     return result
 
 @router.get("/{user_id}/memberships", response_model=List[MembershipWithOrganization])
-async def get_other_user_memberships(
+def get_other_user_memberships(
     user_id: str,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -161,7 +163,7 @@ async def get_other_user_memberships(
 # ... imports ...
 
 @router.put("/me", response_model=UserRead)
-async def update_user_profile(
+def update_user_profile(
     user_data: UserUpdate,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -180,15 +182,22 @@ async def update_user_profile(
         user.phone_number = user_data.phone_number
     if user_data.facebook_link is not None:
         user.facebook_link = user_data.facebook_link
+    delay_changed = user_data.notification_delay is not None and user_data.notification_delay != user.notification_delay
+    if user_data.notification_delay is not None:
+        if user_data.notification_delay < 0:
+            raise HTTPException(status_code=400, detail="Notification delay cannot be negative")
+        user.notification_delay = user_data.notification_delay
     
     session.add(user)
     session.commit()
+    if delay_changed:
+        schedule_user_reminders(session, user.id)
     session.refresh(user)
     
     return user
 
 @router.get("/search", response_model=List[UserSearchResult])
-async def search_users(
+def search_users(
     q: str = Query(..., min_length=1, description="Search query"),
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -218,7 +227,7 @@ async def search_users(
 
 
 @router.get("/{user_id}", response_model=UserRead)
-async def get_user_profile(
+def get_user_profile(
     user_id: str,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -235,7 +244,7 @@ async def get_user_profile(
     return user
 
 @router.get("/", response_model=PaginatedResponse[UserRead])
-async def list_users(
+def list_users(
     page: int = 1,
     size: int = 50,
     search: Optional[str] = None,
@@ -279,7 +288,7 @@ async def list_users(
     )
 
 @router.post("/invite", response_model=UserRead)
-async def invite_user(
+def invite_user(
     invite: UserInvite,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -310,15 +319,12 @@ async def invite_user(
     <p>Vous avez été invité à rejoindre Calend'INT.</p>
     <p>Veuillez vous connecter pour configurer votre compte: <a href="{app_url}/login">{app_url}/login</a></p>
     """
-    try:
-        send_email(user.email, "Calend'INT by MiNET", html_content)
-    except Exception as e:
-        print(f"Error sending email: {e}")
+    queue_email(session, user.email, "Calend'INT by MiNET", html_content)
     
     return user
 
 @router.put("/{user_id}/superadmin", response_model=UserRead)
-async def toggle_superadmin(
+def toggle_superadmin(
     user_id: str,
     is_superadmin: bool,
     current_user: User = Depends(get_current_user),
@@ -333,6 +339,7 @@ async def toggle_superadmin(
         raise HTTPException(status_code=404, detail="User not found")
     
     user.is_superadmin = is_superadmin
+    user.perm_version += 1
     session.add(user)
     session.commit()
     session.refresh(user)
@@ -340,7 +347,7 @@ async def toggle_superadmin(
     return user
 
 @router.put("/{user_id}/active", response_model=UserRead)
-async def toggle_active(
+def toggle_active(
     user_id: str,
     is_active: bool,
     current_user: User = Depends(get_current_user),
@@ -359,6 +366,7 @@ async def toggle_active(
         raise HTTPException(status_code=400, detail="Cannot ban yourself")
 
     user.is_active = is_active
+    user.perm_version += 1
     session.add(user)
     session.commit()
     session.refresh(user)
@@ -366,7 +374,7 @@ async def toggle_active(
     return user
 
 @router.delete("/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: str,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
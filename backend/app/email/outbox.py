@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+import smtplib
+from typing import List, Optional, Union
+from uuid import UUID
+
+from sqlmodel import Session, col, func, select, update
+
+from app.email.utils import SMTPMailer
+from app.models import EmailOutbox, EmailStatus
+
+logger = logging.getLogger(__name__)
+
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BACKOFF = int(os.getenv("EMAIL_RETRY_BACKOFF", "30")) # Seconds, doubled on every attempt
+# Seconds a worker has to send a claimed batch before other workers may claim it again
+EMAIL_CLAIM_TIMEOUT = int(os.getenv("EMAIL_CLAIM_TIMEOUT", "600"))
+
+# Errors about a single email, the others mean the server can not be used right now
+REJECTED_EMAIL_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+def queue_email(
+    session: Session,
+    email_to: Union[str, List[str]],
+    subject: str,
+    html_content: str,
+) -> EmailOutbox:
+    """Store an email in the outbox, the mail worker sends it shortly after the commit"""
+    if isinstance(email_to, str):
+        email_to = [email_to]
+
+    email = EmailOutbox(email_to=", ".join(email_to), subject=subject, html_content=html_content)
+    session.add(email)
+    session.commit()
+    return email
+
+def process_outbox(session: Session, mailer: SMTPMailer) -> tuple[int, int]:
+    """Send the emails due in the outbox over the mailer's connection
+
+    A batch is claimed in a short transaction: its rows are locked with FOR UPDATE
+    SKIP LOCKED, so that every worker can drain the outbox concurrently, and leased
+    for EMAIL_CLAIM_TIMEOUT by moving their next attempt. The emails are sent after
+    that commit, without holding locks, then their outcome is written. A worker that
+    dies mid-batch leaves its emails to be retried once the lease expires.
+
+    Failed emails are retried with exponential backoff until EMAIL_MAX_ATTEMPTS. When
+    the server can not be reached, the rest of the batch is put back with the same
+    delay instead of waiting out SMTP_TIMEOUT for each email. Returns (sent, failed)
+    counts, emails put back unsent are not counted.
+    """
+    now = datetime.now(timezone.utc)
+    emails = session.exec(
+        select(EmailOutbox)
+        .where(
+            EmailOutbox.status == EmailStatus.PENDING,
+            EmailOutbox.next_attempt_at <= now
+        )
+        .order_by(EmailOutbox.next_attempt_at) # pyright: ignore
+        .limit(EMAIL_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    ).all()
+    batch = [(email.id, email.email_to, email.subject, email.html_content) for email in emails]
+    for email in emails:
+        email.next_attempt_at = now + timedelta(seconds=EMAIL_CLAIM_TIMEOUT)
+        session.add(email)
+    session.commit()
+
+    # Outcome by email id: None once sent, else the error
+    results: dict[UUID, Optional[Exception]] = {}
+    retry_at = None
+    for email_id, email_to, subject, html_content in batch:
+        try:
+            mailer.send(email_to.split(", "), subject, html_content)
+        except Exception as e:
+            # Start over with a fresh connection for the next email
+            mailer.close()
+            results[email_id] = e
+            if not isinstance(e, REJECTED_EMAIL_ERRORS):
+                break
+        else:
+            results[email_id] = None
+
+    sent = failed = 0
+    now = datetime.now(timezone.utc)
+    for email_id, error in results.items():
+        email = session.get(EmailOutbox, email_id)
+        if email is None:
+            continue
+        if error is None:
+            email.status = EmailStatus.SENT
+            email.sent_at = now
+            sent += 1
+        else:
+            email.attempts += 1
+            email.last_error = str(error)
+            if email.attempts >= EMAIL_MAX_ATTEMPTS:
+                email.status = EmailStatus.FAILED
+                logger.error(f"Giving up on email {email.id} to {email.email_to}: {error}")
+            else:
+                email.next_attempt_at = now + timedelta(seconds=EMAIL_RETRY_BACKOFF * 2 ** (email.attempts - 1))
+                retry_at = email.next_attempt_at
+                logger.warning(f"Failed to send email {email.id}, attempt {email.attempts}: {error}")
+            failed += 1
+        session.add(email)
+
+    # The server was unreachable, the emails after the failed one were not tried
+    unsent = [email_id for email_id, *_ in batch if email_id not in results]
+    if unsent:
+        session.exec(
+            update(EmailOutbox)
+            .where(col(EmailOutbox.id).in_(unsent))
+            .values(next_attempt_at=retry_at or now + timedelta(seconds=EMAIL_RETRY_BACKOFF))
+        ) # pyright: ignore
+        logger.warning(f"Put back {len(unsent)} emails until the SMTP server is reachable")
+
+    session.commit()
+    return sent, failed
+
+def get_outbox_depth(session: Session) -> dict[str, int]:
+    """Number of emails in the outbox by status"""
+    rows = session.exec(
+        select(EmailOutbox.status, func.count(col(EmailOutbox.id))).group_by(EmailOutbox.status)
+    ).all()
+    depth = {status.value: 0 for status in EmailStatus}
+    depth.update({EmailStatus(status).value: count for status, count in rows})
+    return depth
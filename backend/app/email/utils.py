@@ -1,51 +1,110 @@
+from datetime import datetime
 import smtplib
 import os
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import List, Union, Any, Dict
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from typing import List, Optional, Union, Any, Dict
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
 from pathlib import Path
 
 # Configure Jinja2
 TEMPLATE_DIR = Path(__file__).parent / "templates"
 env = Environment(
     loader=FileSystemLoader(TEMPLATE_DIR),
-    autoescape=select_autoescape(['html', 'xml'])
+    autoescape=select_autoescape(['html', 'xml']),
+    # Templates ship with the code, do not stat them for changes on every render
+    auto_reload=False,
+    cache_size=-1
 )
+# Compile every template once at import instead of on first use
+templates = {name: env.get_template(name) for name in env.list_templates(extensions=["html"])}
+
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "1025"))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+EMAILS_FROM_EMAIL = os.getenv("EMAILS_FROM_EMAIL", "calendint@minet.net")
+EMAILS_FROM_NAME = os.getenv("EMAILS_FROM_NAME", "Calend'INT by MiNET")
+
+def get_email_template(template_name: str) -> Template:
+    template = templates.get(template_name)
+    return template if template is not None else env.get_template(template_name)
+
+def email_base_context() -> Dict[str, Any]:
+    """Context shared by every email, see templates/base.html"""
+    return {
+        "project_name": "Calend'INT",
+        "year": datetime.now().year
+    }
 
 def render_email_template(template_name: str, context: Dict[str, Any]) -> str:
-    """Render a Jinja2 email template"""
-    template = env.get_template(template_name)
-    return template.render(**context)
-
-def send_email(
-    email_to: Union[str, List[str]],
-    subject: str,
-    html_content: str,
-) -> None:
-    """Send an email using SMTP"""
-    smtp_host = os.getenv("SMTP_HOST", "localhost")
-    smtp_port = int(os.getenv("SMTP_PORT", "1025"))
-    smtp_user = os.getenv("SMTP_USER", "")
-    smtp_password = os.getenv("SMTP_PASSWORD", "")
-    emails_from_email = os.getenv("EMAILS_FROM_EMAIL", "calendint@minet.net")
-    emails_from_name = os.getenv("EMAILS_FROM_NAME", "Calend'INT by MiNET")
-
-    if isinstance(email_to, str):
-        email_to = [email_to]
+    """Render a Jinja2 email template
 
+    Every email is sent to a single recipient, there is no bulk variant.
+    """
+    return get_email_template(template_name).render({**email_base_context(), **context})
+
+def build_message(email_to: List[str], subject: str, html_content: str) -> MIMEMultipart:
     message = MIMEMultipart("alternative")
     message["Subject"] = subject
-    message["From"] = f"{emails_from_name} <{emails_from_email}>"
+    message["From"] = f"{EMAILS_FROM_NAME} <{EMAILS_FROM_EMAIL}>"
     message["To"] = ", ".join(email_to)
 
     part = MIMEText(html_content, "html")
     message.attach(part)
+    return message
+
+class SMTPMailer:
+    """Sends many messages over a single authenticated SMTP connection
+
+    The connection is opened on the first message and reopened if the server drops it.
+    """
+
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, user: str = SMTP_USER, password: str = SMTP_PASSWORD):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.server: Optional[smtplib.SMTP] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def connect(self) -> smtplib.SMTP:
+        if self.server is None:
+            server = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+            try:
+                if self.user and self.password:
+                    server.login(self.user, self.password)
+            except Exception:
+                server.close()
+                raise
+            self.server = server
+        return self.server
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except smtplib.SMTPException:
+            self.server.close()
+        except OSError:
+            self.server.close()
+        self.server = None
+
+    def send(self, email_to: Union[str, List[str]], subject: str, html_content: str) -> None:
+        if isinstance(email_to, str):
+            email_to = [email_to]
+        message = build_message(email_to, subject, html_content).as_string()
 
-    try:
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            if smtp_user and smtp_password:
-                server.login(smtp_user, smtp_password)
-            server.sendmail(emails_from_email, email_to, message.as_string())
-    except Exception as e:
-        print(f"Failed to send email: {e}")
+        try:
+            self.connect().sendmail(EMAILS_FROM_EMAIL, email_to, message)
+        except smtplib.SMTPServerDisconnected:
+            # The server closed an idle connection, retry once on a fresh one
+            self.server = None
+            self.connect().sendmail(EMAILS_FROM_EMAIL, email_to, message)
@@ -5,7 +5,7 @@ import os
 import time
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from sqlalchemy.exc import OperationalError
 from sqlmodel import Session
 from starlette.middleware.sessions import SessionMiddleware
@@ -26,9 +26,15 @@ from app.api import (
     upload,
     users,
 )
-from app.api.notifications import process_notifications
+from app.api.notifications import process_notifications, schedule_reminders
+from app.api.short_links import flush_buffered_visits
 from app.database import create_db_and_tables
 from app.database import engine
+from app.database import advisory_lock, LeaderLock, MIGRATIONS_LOCK_ID, NOTIFICATIONS_LOCK_ID
+from app.database import DATABASE_REPLICA_URL, mark_read_primary
+from app.database import change_listener
+from app.email.outbox import EMAIL_BATCH_SIZE, process_outbox
+from app.email.utils import SMTPMailer
 from app.migration_runner import run_migrations
 
 
@@ -38,14 +44,19 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+EMAIL_POLL_INTERVAL = int(os.getenv("EMAIL_POLL_INTERVAL", "5"))
+SHORT_LINK_FLUSH_INTERVAL = int(os.getenv("SHORT_LINK_FLUSH_INTERVAL", "10"))
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     retries = 30
     while retries > 0:
         try:
-            create_db_and_tables()
-            logger.info("Database connection successful and tables created.")
-            run_migrations()
+            # Workers and replicas start together, only one of them migrates at a time
+            with advisory_lock(MIGRATIONS_LOCK_ID):
+                create_db_and_tables()
+                logger.info("Database connection successful and tables created.")
+                run_migrations()
             break
         except OperationalError as e:
             retries -= 1
@@ -57,31 +68,87 @@ async def lifespan(app: FastAPI):
         logger.error("Could not connect to the database after multiple attempts.")
         raise Exception("Database connection failed")
 
-    # Start notification loop
+    # Evict the caches of this worker when another one commits a change, see ChangeListener
+    change_listener.start()
+
+    # Start notification loop, run by a single elected worker across all replicas
+    leader = LeaderLock(NOTIFICATIONS_LOCK_ID)
+
     async def notification_loop():
+        def rebuild_schedule():
+            with Session(engine) as session:
+                schedule_reminders(session)
+
         def run_check():
             with Session(engine) as session:
                 return process_notifications(session)
 
+        is_leader = False
         while True:
             try:
-                cron_delay = int(os.getenv("CRON_DELAY", "900"))
-                logger.info("Running notification check...")
-                
-                count = await asyncio.to_thread(run_check)
-                
-                if count > 0:
-                    logger.info(f"Sent {count} notifications")
+                cron_delay = int(os.getenv("CRON_DELAY", "60"))
+                was_leader, is_leader = is_leader, await asyncio.to_thread(leader.acquire)
+
+                if is_leader and not was_leader:
+                    logger.info("Elected to run the notification loop.")
+                    # Catch up on reminders whose events or subscriptions changed while nobody was leading
+                    await asyncio.to_thread(rebuild_schedule)
+
+                if is_leader:
+                    logger.info("Running notification check...")
+                    
+                    report = await asyncio.to_thread(run_check)
+                    
+                    if report.total > 0:
+                        logger.info(f"Sent {report}")
                 await asyncio.sleep(cron_delay)
             except Exception as e:
                 logger.error(f"Error in notification loop: {e}")
+                is_leader = False # Redo the catch-up once the database is reachable again
                 await asyncio.sleep(60) # Wait a bit before retrying
 
+    # Drain the email outbox, every worker takes part as rows are claimed with SKIP LOCKED
+    async def mail_loop():
+        def run_outbox():
+            with Session(engine) as session, SMTPMailer() as mailer:
+                return process_outbox(session, mailer)
+
+        while True:
+            try:
+                sent, failed = await asyncio.to_thread(run_outbox)
+                if sent or failed:
+                    logger.info(f"Sent {sent} emails, {failed} failed")
+                # Keep going while a full batch was processed, the outbox may not be empty yet
+                if sent + failed < EMAIL_BATCH_SIZE:
+                    await asyncio.sleep(EMAIL_POLL_INTERVAL)
+            except Exception as e:
+                logger.error(f"Error in mail loop: {e}")
+                await asyncio.sleep(60)
+
+    # Write the short link visits buffered by this worker
+    async def visits_loop():
+        while True:
+            await asyncio.sleep(SHORT_LINK_FLUSH_INTERVAL)
+            try:
+                await asyncio.to_thread(flush_buffered_visits)
+            except Exception as e:
+                logger.error(f"Error flushing short link visits: {e}")
+
     task = asyncio.create_task(notification_loop())
+    mail_task = asyncio.create_task(mail_loop())
+    visits_task = asyncio.create_task(visits_loop())
         
     yield
 
     task.cancel()
+    mail_task.cancel()
+    visits_task.cancel()
+    leader.release()
+    change_listener.stop()
+    try:
+        flush_buffered_visits()
+    except Exception as e:
+        logger.error(f"Error flushing short link visits: {e}")
 
 app = FastAPI(title="Calend'INT API", lifespan=lifespan)
 
@@ -91,6 +158,14 @@ app.add_middleware(
     secret_key=os.getenv("SECRET_KEY", "your-secret-key-change-in-production-please-make-it-long-and-random")
 )
 
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """Keep the client that just wrote something off the replica, see app.database.get_read_session"""
+    response = await call_next(request)
+    if DATABASE_REPLICA_URL and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        mark_read_primary(response)
+    return response
+
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(cas.router, prefix="/auth", tags=["cas"])
 app.include_router(admin.router, prefix="/admin", tags=["admin"])
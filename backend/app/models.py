@@ -1,10 +1,14 @@
 from datetime import datetime, timezone
 from enum import Enum
-from typing import List, Optional
+from typing import List, Optional, TYPE_CHECKING
 from uuid import UUID, uuid4
 
+from sqlalchemy import Index, Sequence, UniqueConstraint, text
 from sqlmodel import Field, Relationship, SQLModel, Session
 
+if TYPE_CHECKING:
+    from app.api.auth import AccessContext
+
 class OrganizationType(str, Enum):
     ASSOCIATION = "association"
     CLUB = "club"
@@ -47,6 +51,7 @@ class User(SQLModel, table=True):
     is_active: bool = Field(default=True)
     is_superadmin: bool = Field(default=False)
     notification_delay: int = Field(default=45) # Minutes before event
+    perm_version: int = Field(default=0) # Bumped when permissions change, see app.api.auth.create_user_access_token
 
     memberships: List["Membership"] = Relationship(back_populates="user")
     subscriptions: List["Subscription"] = Relationship(back_populates="user")
@@ -89,7 +94,7 @@ class Organization(SQLModel, table=True):
 class Membership(SQLModel, table=True):
     """Link between User and Organization with a specific Role"""
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    user_id: UUID = Field(foreign_key="user.id")
+    user_id: UUID = Field(foreign_key="user.id", index=True)
     organization_id: UUID = Field(foreign_key="organization.id")
     role: Role = Field(default=Role.ORG_VIEWER)
 
@@ -133,19 +138,23 @@ class EventLink(SQLModel, table=True):
 
 class EventTag(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    event_id: UUID = Field(foreign_key="event.id")
-    tag_id: UUID = Field(foreign_key="tag.id")
+    event_id: UUID = Field(foreign_key="event.id", index=True)
+    tag_id: UUID = Field(foreign_key="tag.id", index=True)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
     event: Optional["Event"] = Relationship(back_populates="event_tags")
     tag: Tag = Relationship(back_populates="event_links")
 
 class Event(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_event_start_time_id", "start_time", "id"), # Keyset pagination
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     title: str
     description: Optional[str] = None
     start_time: datetime
-    end_time: datetime
+    end_time: datetime = Field(index=True)
     location: Optional[str] = None
     location_url: Optional[str] = None
     visibility: EventVisibility = Field(default=EventVisibility.PUBLIC_PENDING)
@@ -154,6 +163,7 @@ class Event(SQLModel, table=True):
     organization_id: UUID = Field(foreign_key="organization.id")
     created_by_id: UUID = Field(foreign_key="user.id")
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     # New fields for approval workflow
     rejection_message: Optional[str] = None
     hide_details: bool = Field(default=False)
@@ -167,9 +177,9 @@ class Event(SQLModel, table=True):
     guest_organizations: List[Organization] = Relationship(back_populates="guest_events", link_model=EventGuestOrganization)
     reactions: List["EventReaction"] = Relationship(back_populates="event")
 
-    def to_read_model(self, current_user: Optional["User"] = None, session: Optional["Session"] = None):
+    def to_read_model(self, current_user: Optional["User"] = None, session: Optional["Session"] = None, access: Optional["AccessContext"] = None):
         from app.schemas import EventRead
-        return EventRead.from_model(self, current_user, session)
+        return EventRead.from_model(self, current_user, session, access)
 
 
 class Group(SQLModel, table=True):
@@ -186,7 +196,7 @@ class Group(SQLModel, table=True):
 class GroupMembership(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     group_id: UUID = Field(foreign_key="group.id")
-    user_id: UUID = Field(foreign_key="user.id")
+    user_id: UUID = Field(foreign_key="user.id", index=True)
     joined_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
     group: Optional[Group] = Relationship(back_populates="members")
@@ -195,7 +205,7 @@ class GroupMembership(SQLModel, table=True):
 class Subscription(SQLModel, table=True):
     """User subscription to an Organization or Tag"""
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    user_id: UUID = Field(foreign_key="user.id")
+    user_id: UUID = Field(foreign_key="user.id", index=True)
     organization_id: Optional[UUID] = Field(default=None, foreign_key="organization.id")
     tag_id: Optional[UUID] = Field(default=None, foreign_key="tag.id")
     subscribe_all: bool = Field(default=False)
@@ -209,14 +219,50 @@ class Subscription(SQLModel, table=True):
 
 class EventReaction(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    event_id: UUID = Field(foreign_key="event.id")
-    user_id: UUID = Field(foreign_key="user.id")
+    event_id: UUID = Field(foreign_key="event.id", index=True)
+    user_id: UUID = Field(foreign_key="user.id", index=True)
     emoji: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
     event: Optional[Event] = Relationship(back_populates="reactions")
     user: Optional[User] = Relationship()
 
+class NotificationSent(SQLModel, table=True):
+    """Ledger of the notifications already sent, each (user, event, kind) at most once"""
+    __table_args__ = (
+        UniqueConstraint("user_id", "event_id", "kind", name="uq_notificationsent_user_event_kind"),
+    )
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    user_id: UUID = Field(foreign_key="user.id", ondelete="CASCADE")
+    event_id: UUID = Field(foreign_key="event.id", index=True, ondelete="CASCADE")
+    kind: str = Field(default="reminder")
+    sent_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class ScheduledReminder(SQLModel, table=True):
+    """Push reminder of a user for an event, popped by the notification worker once fire_at is reached"""
+    user_id: UUID = Field(foreign_key="user.id", primary_key=True, ondelete="CASCADE")
+    event_id: UUID = Field(foreign_key="event.id", primary_key=True, index=True, ondelete="CASCADE")
+    fire_at: datetime = Field(index=True)
+
+class EmailStatus(str, Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+class EmailOutbox(SQLModel, table=True):
+    """Email waiting to be sent, or already sent, by the mail worker"""
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    email_to: str # Comma separated recipients
+    subject: str
+    html_content: str
+    status: EmailStatus = Field(default=EmailStatus.PENDING, index=True)
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    sent_at: Optional[datetime] = None
+
 class LDAPUser(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     email: str = Field(unique=True, index=True)
@@ -234,7 +280,18 @@ class ShortLinkActionType(str, Enum):
     SUBSCRIBE = "subscribe" 
     COUNTDOWN = "countdown"
 
+# Source of the short link ids, see app.api.short_links.encode_short_id
+shortlink_id_seq = Sequence("shortlink_id_seq", metadata=SQLModel.metadata)
+
 class ShortLink(SQLModel, table=True):
+    __table_args__ = (
+        # One link per item and action, besides the aliases kept by migration 017
+        Index(
+            "uq_shortlink_item_action", "item_type", "item_id", "action_type", unique=True,
+            postgresql_where=text("alias_of IS NULL"), sqlite_where=text("alias_of IS NULL")
+        ),
+    )
+
     id: str = Field(primary_key=True)
     item_type: ShortLinkType
     action_type: ShortLinkActionType
@@ -242,5 +299,7 @@ class ShortLink(SQLModel, table=True):
     created_by_id: UUID = Field(foreign_key="user.id")
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     last_used_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    visit_count: int = Field(default=0)
+    alias_of: Optional[str] = Field(default=None, foreign_key="shortlink.id") # Duplicate link, its visits count for this one
 
     user: Optional[User] = Relationship()
@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta, timezone
 from typing import Any, List, Optional, TYPE_CHECKING
-from typing import Any, Generic, List, Optional, TYPE_CHECKING, TypeVar
+from typing import Any, Generic, List, Optional, Sequence, TYPE_CHECKING, TypeVar
 from uuid import UUID
 
 from pydantic import BaseModel
@@ -11,12 +11,14 @@ T = TypeVar("T")
 
 class PaginatedResponse(BaseModel, Generic[T]):
     items: List[T]
-    total: int
+    total: Optional[int] = None # None when the count was not requested
     page: int
     size: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None # Opaque keyset cursor for the next page, if any
 
 if TYPE_CHECKING:
+    from app.api.auth import AccessContext
     from app.models import Tag, Organization, User, Event, Membership
     from sqlmodel import Session
 
@@ -215,28 +217,103 @@ class EventRead(BaseModel):
     is_draft: Optional[bool] = None
 
     @classmethod
-    def from_model(cls, event: "Event", current_user: Optional["User"] = None, session: Optional["Session"] = None) -> "EventRead":
-        from app.models import Role, Membership, User
+    def from_model(cls, event: "Event", current_user: Optional["User"] = None, session: Optional["Session"] = None, access: Optional["AccessContext"] = None) -> "EventRead":
+        from app.models import Membership, User
         from sqlmodel import select
 
+        # Membership only matters for approved events hiding their details
+        is_member = False
+        hides_details = event.hide_details and event.visibility == EventVisibility.PUBLIC_APPROVED
+        if hides_details and access:
+            is_member = access.role(event.organization_id) is not None
+        elif hides_details and current_user and not current_user.is_superadmin and session:
+            # Check membership
+            membership = session.exec(
+                select(Membership).where(
+                    Membership.user_id == current_user.id,
+                    Membership.organization_id == event.organization_id
+                )
+            ).first()
+            is_member = membership is not None
+        if access:
+            # The membership check may have replaced a user built from token claims,
+            # a superadmin claim is checked before it reveals the privileged fields
+            if access.from_token and access.user and access.user.is_superadmin:
+                access.verify()
+            current_user = access.user
+
+        creator_obj = session.get(User, event.created_by_id) if session and event.created_by_id else None
+
+        return cls._build(event, current_user, creator_obj, is_member)
+
+    @classmethod
+    def from_models(cls, events: Sequence["Event"], current_user: Optional["User"] = None, session: Optional["Session"] = None, access: Optional["AccessContext"] = None) -> List["EventRead"]:
+        """Serialize many events at once, prefetching every relation with a fixed number of queries"""
+        from sqlalchemy.orm import selectinload
+        from sqlmodel import col, select
+        from app.models import Event, EventTag, Membership, Organization, User
+
+        events = list(events)
+        if not events:
+            return []
+        if not session:
+            return [cls.from_model(event, current_user, access=access) for event in events]
+
+        # Populate the relations of the already loaded events using IN batches
+        session.exec(
+            select(Event)
+            .where(col(Event.id).in_([event.id for event in events]))
+            .options(
+                selectinload(Event.organization).selectinload(Organization.organization_links), # pyright: ignore
+                selectinload(Event.guest_organizations).selectinload(Organization.organization_links), # pyright: ignore
+                selectinload(Event.event_tags).selectinload(EventTag.tag), # pyright: ignore
+                selectinload(Event.event_links), # pyright: ignore
+                selectinload(Event.reactions), # pyright: ignore
+                selectinload(Event.group), # pyright: ignore
+            )
+        ).all()
+
+        creator_ids = {event.created_by_id for event in events if event.created_by_id}
+        creators = {
+            user.id: user
+            for user in session.exec(select(User).where(col(User.id).in_(creator_ids))).all()
+        } if creator_ids else {}
+
+        member_org_ids = set()
+        hidden_org_ids = {
+            event.organization_id for event in events
+            if event.hide_details and event.visibility == EventVisibility.PUBLIC_APPROVED
+        }
+        if hidden_org_ids and access:
+            member_org_ids = set(access.roles)
+        elif hidden_org_ids and current_user and not current_user.is_superadmin:
+            member_org_ids = set(session.exec(
+                select(Membership.organization_id).where(
+                    Membership.user_id == current_user.id,
+                    col(Membership.organization_id).in_(hidden_org_ids)
+                )
+            ).all())
+        if access:
+            if access.from_token and access.user and access.user.is_superadmin:
+                access.verify()
+            current_user = access.user
+
+        return [
+            cls._build(
+                event,
+                current_user,
+                creators.get(event.created_by_id),
+                event.organization_id in member_org_ids
+            )
+            for event in events
+        ]
+
+    @classmethod
+    def _build(cls, event: "Event", current_user: Optional["User"], creator_obj: Optional["User"], is_member: bool) -> "EventRead":
         # Logic to determine if user can see details
         should_hide = False
         if event.hide_details and event.visibility == EventVisibility.PUBLIC_APPROVED:
-             is_auth = False
-             if current_user:
-                 if current_user.is_superadmin:
-                     is_auth = True
-                 elif session:
-                     # Check membership
-                     membership = session.exec(
-                        select(Membership).where(
-                            Membership.user_id == current_user.id,
-                            Membership.organization_id == event.organization_id
-                        )
-                     ).first()
-                     if membership:
-                         is_auth = True
-             
+             is_auth = bool(current_user and (current_user.is_superadmin or is_member))
              if not is_auth:
                  should_hide = True
 
@@ -280,11 +357,7 @@ class EventRead(BaseModel):
             for emoji, count in reaction_counts.items()
         ]
 
-        creator = None
-        if session and event.created_by_id:
-             creator_obj = session.get(User, event.created_by_id)
-             if creator_obj:
-                 creator = UserPublicRead.from_model(creator_obj)
+        creator = UserPublicRead.from_model(creator_obj) if creator_obj else None
 
         group_read = None
         if event.group:
@@ -338,6 +411,16 @@ class ShortLinkRead(BaseModel):
     id: str
     url: str
 
+class ShortLinkStats(BaseModel):
+    id: str
+    url: str
+    item_type: str
+    item_id: UUID
+    action_type: str
+    visit_count: int
+    created_at: datetime
+    last_used_at: datetime
+
 class ShortLinkInfo(BaseModel):
     id: str
     title: str
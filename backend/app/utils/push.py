@@ -0,0 +1,169 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import threading
+import time
+from typing import Iterable, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from py_vapid import Vapid, Vapid01
+from pywebpush import WebPushException, webpush
+
+logger = logging.getLogger(__name__)
+
+PUSH_CONCURRENCY = int(os.getenv("PUSH_CONCURRENCY", "10"))
+PUSH_TIMEOUT = float(os.getenv("PUSH_TIMEOUT", "10"))
+PUSH_MAX_RETRIES = int(os.getenv("PUSH_MAX_RETRIES", "2"))
+PUSH_RETRY_BACKOFF = float(os.getenv("PUSH_RETRY_BACKOFF", "0.5"))
+
+# Push services answer these once a subscription is gone for good
+EXPIRED_STATUSES = {404, 410}
+# Transient errors worth another attempt
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+DELIVERED = "delivered"
+FAILED = "failed"
+EXPIRED = "expired"
+
+class PushMessage:
+    def __init__(self, endpoint: str, keys: dict, data: str):
+        self.endpoint = endpoint
+        self.keys = keys
+        self.data = data
+
+class PushReport:
+    """Outcome of a batch of push messages"""
+
+    def __init__(self):
+        self.delivered = 0
+        self.failed = 0
+        self.expired_endpoints: list[str] = []
+        # Push tokens deleted after the batch because their subscription expired
+        self.pruned = 0
+
+    @property
+    def expired(self) -> int:
+        return len(self.expired_endpoints)
+
+    @property
+    def total(self) -> int:
+        return self.delivered + self.failed + self.expired
+
+    def merge(self, other: "PushReport"):
+        self.delivered += other.delivered
+        self.failed += other.failed
+        self.expired_endpoints.extend(other.expired_endpoints)
+        self.pruned += other.pruned
+
+    def __str__(self):
+        return f"{self.total} notifications: {self.delivered} delivered, {self.failed} failed, {self.expired} expired, {self.pruned} tokens pruned"
+
+def load_vapid_key(vapid_private_key: str | Vapid01) -> Vapid01:
+    if isinstance(vapid_private_key, Vapid01):
+        return vapid_private_key
+    if os.path.isfile(vapid_private_key):
+        return Vapid.from_file(private_key_file=vapid_private_key)
+    return Vapid.from_string(private_key=vapid_private_key)
+
+class PushSender:
+    """Sends Web Push messages from a bounded thread pool
+
+    Each push service origin gets its own pooled HTTP session, so that connections
+    are reused across the messages of a batch instead of being opened per message.
+    Timeouts and transient errors are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        vapid_private_key: str | Vapid01,
+        vapid_claims: dict,
+        concurrency: int = PUSH_CONCURRENCY,
+        timeout: float = PUSH_TIMEOUT,
+        max_retries: int = PUSH_MAX_RETRIES,
+        retry_backoff: float = PUSH_RETRY_BACKOFF
+    ):
+        # Parsed once instead of on every webpush call
+        self.vapid = load_vapid_key(vapid_private_key)
+        self.vapid_claims = vapid_claims
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._sessions: dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            for http in self._sessions.values():
+                http.close()
+            self._sessions.clear()
+
+    def _session_for(self, endpoint: str) -> requests.Session:
+        url = urlparse(endpoint)
+        origin = f"{url.scheme}://{url.netloc}"
+        with self._lock:
+            http = self._sessions.get(origin)
+            if http is None:
+                http = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+                http.mount("https://", adapter)
+                http.mount("http://", adapter)
+                self._sessions[origin] = http
+            return http
+
+    def _deliver(self, message: PushMessage) -> str:
+        error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            try:
+                webpush(
+                    subscription_info={"endpoint": message.endpoint, "keys": message.keys},
+                    data=message.data,
+                    vapid_private_key=self.vapid,
+                    # webpush stores the audience of the endpoint in the claims it is given
+                    vapid_claims=dict(self.vapid_claims),
+                    timeout=self.timeout,
+                    requests_session=self._session_for(message.endpoint)
+                )
+                return DELIVERED
+            except WebPushException as ex:
+                status = ex.response.status_code if ex.response is not None else None
+                if status in EXPIRED_STATUSES:
+                    return EXPIRED
+                error = ex
+                if status not in RETRYABLE_STATUSES:
+                    break
+            except requests.RequestException as e:
+                error = e
+            except Exception as e:
+                error = e
+                break
+
+        logger.error(f"WebPush Error: {error}")
+        return FAILED
+
+    def send(self, messages: Iterable[PushMessage]) -> PushReport:
+        messages = list(messages)
+        report = PushReport()
+        if not messages:
+            return report
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(messages))) as pool:
+            for message, outcome in zip(messages, pool.map(self._deliver, messages)):
+                if outcome == DELIVERED:
+                    report.delivered += 1
+                elif outcome == EXPIRED:
+                    report.expired_endpoints.append(message.endpoint)
+                else:
+                    report.failed += 1
+
+        return report
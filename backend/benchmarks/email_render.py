@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Measure email template render throughput: the previous per-call template lookup
+(auto reloading FileSystemLoader) and the precompiled templates of app/email/utils.py.
+
+    uv run python benchmarks/email_render.py --renders 5000
+"""
+import argparse
+from datetime import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from app.email.utils import TEMPLATE_DIR, render_email_template
+
+TEMPLATE = "event_approved.html"
+EVENT_CONTEXT = {
+    "event_title": "Soirée d'intégration",
+    "event_date": "12/09/2026 à 20:00",
+    "event_location": "Foyer",
+    "event_url": "https://cal.example.net/events/1234",
+}
+
+def recipients(count: int):
+    return [{"user_name": f"user{i}"} for i in range(count)]
+
+def previous_render(count: int):
+    # As before: default Environment, template looked up on every call
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(['html', 'xml']))
+    for context in recipients(count):
+        env.get_template(TEMPLATE).render(
+            project_name="Calend'INT", year=datetime.now().year, **EVENT_CONTEXT, **context
+        )
+
+def precompiled_render(count: int):
+    for context in recipients(count):
+        render_email_template(TEMPLATE, {**EVENT_CONTEXT, **context})
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=5000)
+    args = parser.parse_args()
+
+    for label, render in (("per-call lookup", previous_render), ("precompiled", precompiled_render)):
+        start = time.perf_counter()
+        render(args.renders)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>16}: {elapsed:7.3f}s  {args.renders / elapsed:9.0f} renders/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Load a running backend with concurrent GET requests and report throughput and latency.
+
+Point it at the same endpoint before and after a change, with the same number of
+workers, e.g. the ICS feed or /auth/me (with --token):
+
+    uv run python benchmarks/http_load.py http://localhost:8000/calendar/<key>/<user>.ics --concurrency 50
+    uv run python benchmarks/http_load.py http://localhost:8000/auth/me --token <jwt> --requests 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+async def worker(client: httpx.AsyncClient, url: str, remaining: list[int], latencies: list[float], statuses: dict[int, int]):
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        start = time.perf_counter()
+        try:
+            response = await client.get(url)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 0
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+
+async def run(url: str, requests: int, concurrency: int, token: str | None):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    remaining = [requests]
+
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, url, remaining, latencies, statuses) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"{requests} requests, concurrency {concurrency}: {elapsed:.2f}s, {requests / elapsed:.1f} req/s")
+    print(f"latency ms: mean {statistics.mean(latencies) * 1000:.1f}  p50 {p(0.5):.1f}  p95 {p(0.95):.1f}  p99 {p(0.99):.1f}")
+    print("statuses: " + ", ".join(f"{status or 'error'}: {count}" for status, count in sorted(statuses.items())))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--token", help="bearer token for authenticated endpoints")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.concurrency, args.token))
+
+if __name__ == "__main__":
+    main()
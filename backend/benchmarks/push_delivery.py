@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Exercise app/utils/push.py against a local stub push service.
+
+The stub answers every push after --latency seconds, with 410 Gone for a share
+of the subscriptions (--expired) and 503 on the first attempt for another share
+(--flaky). Compares serial delivery (concurrency 1) with the pooled sender.
+
+    uv run python benchmarks/push_delivery.py --messages 500 --latency 0.05
+"""
+import argparse
+import base64
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from py_vapid import Vapid
+
+from app.utils.push import PushMessage, PushSender
+
+def b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def make_keys() -> dict:
+    public_key = ec.generate_private_key(ec.SECP256R1()).public_key()
+    return {
+        "p256dh": b64url(public_key.public_bytes(Encoding.X962, PublicFormat.UncompressedPoint)),
+        "auth": b64url(os.urandom(16)),
+    }
+
+def make_stub_handler(latency: float):
+    seen = set()
+    lock = threading.Lock()
+
+    class StubPushService(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            if self.path.startswith("/expired/"):
+                status = 410
+            elif self.path.startswith("/flaky/"):
+                with lock:
+                    status = 201 if self.path in seen else 503
+                    seen.add(self.path)
+            else:
+                status = 201
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubPushService
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub response time in seconds")
+    parser.add_argument("--expired", type=float, default=0.1, help="share of 410 Gone subscriptions")
+    parser.add_argument("--flaky", type=float, default=0.05, help="share of subscriptions failing once with 503")
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_stub_handler(args.latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    origin = f"http://127.0.0.1:{server.server_port}"
+
+    vapid = Vapid()
+    vapid.generate_keys()
+    claims = {"sub": "mailto:admin@example.com"}
+
+    def make_messages(run: str):
+        rng = random.Random(0)
+        messages = []
+        for i in range(args.messages):
+            draw = rng.random()
+            kind = "expired" if draw < args.expired else "flaky" if draw < args.expired + args.flaky else "ok"
+            messages.append(PushMessage(f"{origin}/{kind}/{run}-{i}", make_keys(), '{"title": "Rappel: benchmark"}'))
+        return messages
+
+    for label, concurrency in (("serial", 1), ("pooled", args.concurrency)):
+        messages = make_messages(label)
+        with PushSender(vapid, claims, concurrency=concurrency, retry_backoff=0.01) as sender:
+            start = time.perf_counter()
+            report = sender.send(messages)
+            elapsed = time.perf_counter() - start
+        print(f"{label:>7} (concurrency {concurrency:>3}): {elapsed:7.2f}s  {report}")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
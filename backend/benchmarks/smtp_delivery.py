@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Compare sending emails over one SMTP connection each (previous send_email) with
+SMTPMailer reusing a single connection, against a local aiosmtpd server.
+
+aiosmtpd is not a dependency of the backend, pull it for the run:
+
+    uv run --with aiosmtpd python benchmarks/smtp_delivery.py --messages 500
+"""
+import argparse
+import os
+import smtplib
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiosmtpd.controller import Controller
+
+from app.email.utils import EMAILS_FROM_EMAIL, SMTPMailer, build_message
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+def send_with_new_connections(host: str, port: int, count: int):
+    for i in range(count):
+        message = build_message(["user@example.com"], f"Benchmark {i}", "<p>Hello</p>").as_string()
+        with smtplib.SMTP(host, port) as server:
+            server.sendmail(EMAILS_FROM_EMAIL, ["user@example.com"], message)
+
+def send_with_mailer(host: str, port: int, count: int):
+    with SMTPMailer(host, port, "", "") as mailer:
+        for i in range(count):
+            mailer.send("user@example.com", f"Benchmark {i}", "<p>Hello</p>")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+
+    handler = CountingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=0)
+    controller.start()
+    host, port = controller.hostname, controller.server.sockets[0].getsockname()[1]
+
+    try:
+        for label, send in (("connection per email", send_with_new_connections), ("SMTPMailer", send_with_mailer)):
+            before = handler.received
+            start = time.perf_counter()
+            send(host, port, args.messages)
+            elapsed = time.perf_counter() - start
+            print(f"{label:>21}: {elapsed:7.3f}s  {args.messages / elapsed:8.1f} emails/s  ({handler.received - before} received)")
+    finally:
+        controller.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import pytest
+from sqlmodel import Session, and_, col, or_, select
+
+from app.api.auth import AccessContext
+from app.api.events import get_visibility_conditions
+from app.models import (
+    Event,
+    EventVisibility,
+    Group,
+    GroupMembership,
+    Membership,
+    Organization,
+    OrganizationType,
+    Role,
+    User,
+)
+
+def in_list_visibility_conditions(access: AccessContext):
+    """get_visibility_conditions as it was before the EXISTS subqueries, with the
+    memberships loaded first and matched with IN lists. Reference for the matrix."""
+    current_user = access.user
+    conditions = [Event.visibility == EventVisibility.PUBLIC_APPROVED]
+    if current_user and current_user.is_superadmin:
+        conditions = [col(Event.visibility).in_([EventVisibility.PUBLIC_APPROVED, EventVisibility.PUBLIC_PENDING])]
+    elif not current_user:
+        return or_(*conditions)
+
+    conditions.append(and_(Event.created_by_id == current_user.id, Event.visibility == EventVisibility.PRIVATE))
+    org_ids = access.org_ids
+    if org_ids:
+        conditions.append(and_(
+            col(Event.organization_id).in_(org_ids),
+            col(Event.visibility).in_([EventVisibility.DRAFT, EventVisibility.PUBLIC_PENDING, EventVisibility.PUBLIC_REJECTED])
+        ))
+        admin_org_ids = access.admin_org_ids
+        if admin_org_ids:
+            conditions.append(and_(Event.visibility == EventVisibility.PRIVATE, col(Event.organization_id).in_(admin_org_ids)))
+        else:
+            conditions.append(and_(
+                Event.visibility == EventVisibility.PRIVATE,
+                col(Event.group_id).is_(None),
+                col(Event.organization_id).in_(org_ids)
+            ))
+    group_ids = access.group_ids
+    if group_ids:
+        conditions.append(and_(Event.visibility == EventVisibility.PRIVATE, col(Event.group_id).in_(group_ids)))
+    return or_(*conditions)
+
+# Role of each user in the organization of the events ("club"), None for no membership
+ROLES = {
+    "viewer": Role.ORG_VIEWER,
+    "member": Role.ORG_MEMBER,
+    "admin": Role.ORG_ADMIN,
+    "superadmin": None,
+    "group_member": None,
+    "outsider": None,
+    # Admin of another organization, which hides the private events of "club" without a group
+    "viewer_admin_elsewhere": Role.ORG_VIEWER,
+}
+
+@pytest.fixture
+def matrix(session: Session):
+    """An event for every visibility, with and without a group, created by the
+    member or by an outsider, and a user for every role"""
+    now = datetime.now(timezone.utc)
+    club = Organization(name="Club", slug="club", type=OrganizationType.CLUB)
+    other = Organization(name="Other", slug="other", type=OrganizationType.CLUB)
+    users = {name: User(email=f"{name}@example.net", is_superadmin=name == "superadmin") for name in ROLES}
+    session.add_all([club, other, *users.values()])
+    session.commit()
+
+    group = Group(name="Bureau", organization_id=club.id)
+    session.add(group)
+    session.commit()
+    for name, role in ROLES.items():
+        if role:
+            session.add(Membership(user_id=users[name].id, organization_id=club.id, role=role))
+    session.add(Membership(user_id=users["viewer_admin_elsewhere"].id, organization_id=other.id, role=Role.ORG_ADMIN))
+    session.add(GroupMembership(user_id=users["group_member"].id, group_id=group.id))
+
+    for visibility in EventVisibility:
+        for group_id in (None, group.id):
+            for creator in ("member", "outsider"):
+                session.add(Event(
+                    title=f"{visibility.value}/{'group' if group_id else 'org'}/{creator}",
+                    start_time=now + timedelta(days=1),
+                    end_time=now + timedelta(days=1, hours=2),
+                    visibility=visibility,
+                    group_id=group_id,
+                    organization_id=club.id,
+                    created_by_id=users[creator].id
+                ))
+    session.commit()
+    return users
+
+def visible_titles(session: Session, conditions) -> set[str]:
+    return set(session.exec(select(Event.title).where(conditions)).all())
+
+def claims_user(user: User) -> User:
+    """The user as get_access_context builds it from the claims of a token"""
+    return User(id=user.id, email=user.email, is_superadmin=user.is_superadmin, perm_version=user.perm_version)
+
+@pytest.mark.parametrize("name", [None, *ROLES])
+@pytest.mark.parametrize("from_token", [False, True])
+def test_exists_conditions_match_in_lists(session, matrix, name: Optional[str], from_token: bool):
+    user = matrix[name] if name else None
+    expected = visible_titles(session, in_list_visibility_conditions(AccessContext(user, session)))
+
+    access = AccessContext(claims_user(user) if user and from_token else user, session, from_token=from_token and user is not None)
+    assert visible_titles(session, get_visibility_conditions(access)) == expected
+
+def test_matrix_expectations(session, matrix):
+    def titles(name: Optional[str]) -> set[str]:
+        return visible_titles(session, get_visibility_conditions(AccessContext(matrix[name] if name else None, session)))
+
+    approved = {title for title in titles(None) if title.startswith("public_approved/")}
+    assert titles(None) == approved and len(approved) == 4
+    assert titles("outsider") == approved | {"private/org/outsider", "private/group/outsider"}
+    assert {title.split("/")[0] for title in titles("superadmin")} == {"public_approved", "public_pending"}
+    assert "private/group/member" in titles("admin")
+    assert "private/group/member" in titles("group_member")
+    assert "private/group/member" not in titles("viewer")
+    assert "private/org/member" in titles("viewer")
+    assert "private/org/member" not in titles("viewer_admin_elsewhere")
+    assert "draft/org/outsider" in titles("viewer")
+
+def test_banned_token_user_only_sees_public_events(session, matrix):
+    admin = matrix["admin"]
+    admin.is_active = False
+    session.add(admin)
+    session.commit()
+
+    access = AccessContext(claims_user(admin), session, from_token=True)
+    assert {title.split("/")[0] for title in visible_titles(session, get_visibility_conditions(access))} == {"public_approved"}
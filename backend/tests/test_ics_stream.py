@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+from icalendar import Calendar
+from sqlmodel import select
+
+from app.api.ics import build_calendar, get_feed_conditions, stream_calendar
+from app.models import Event, EventVisibility, Membership, Organization, OrganizationType, Role, User
+
+def seed_feed(session, count: int) -> User:
+    now = datetime.now(timezone.utc)
+    user = User(email="member@example.net", full_name="Member")
+    org = Organization(name="Club", slug="club", type=OrganizationType.CLUB)
+    other = Organization(name="Other", slug="other", type=OrganizationType.CLUB)
+    session.add_all([user, org, other])
+    session.commit()
+    session.add(Membership(user_id=user.id, organization_id=org.id, role=Role.ORG_MEMBER))
+    for i in range(count):
+        session.add(Event(
+            title=f"Soirée n°{i}",
+            # Long enough to be folded over several lines
+            description="Une description assez longue pour être repliée sur plusieurs lignes. " * (i % 4),
+            location="Foyer, bâtiment U" if i % 2 else None,
+            start_time=now + timedelta(days=i % 7, hours=i),
+            end_time=now + timedelta(days=i % 7, hours=i + 2),
+            visibility=EventVisibility.PUBLIC_APPROVED,
+            organization_id=org.id,
+            created_by_id=user.id
+        ))
+    # Not part of the feed
+    session.add(Event(
+        title="Ailleurs",
+        start_time=now,
+        end_time=now + timedelta(hours=1),
+        visibility=EventVisibility.PUBLIC_APPROVED,
+        organization_id=other.id,
+        created_by_id=user.id
+    ))
+    session.commit()
+    return user
+
+def built_and_streamed(session, engine, user: User) -> tuple[bytes, bytes]:
+    conditions = get_feed_conditions(user, session)
+    events = session.exec(select(Event).where(conditions).order_by(Event.start_time, Event.id)).all() # pyright: ignore
+    return build_calendar(events), b"".join(stream_calendar(conditions, engine))
+
+def test_streamed_feed_matches_built_feed(session, engine):
+    user = seed_feed(session, 25)
+    built, streamed = built_and_streamed(session, engine, user)
+
+    assert streamed == built
+    events = Calendar.from_ical(streamed).walk("VEVENT")
+    assert len(events) == 25
+    assert "Ailleurs" not in {str(event.get("summary")) for event in events}
+
+def test_empty_streamed_feed_matches_built_feed(session, engine):
+    user = seed_feed(session, 0)
+    built, streamed = built_and_streamed(session, engine, user)
+
+    assert streamed == built
+    assert Calendar.from_ical(streamed).walk("VEVENT") == []
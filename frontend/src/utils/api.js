@@ -16,6 +16,15 @@ api.interceptors.request.use((config) => {
     return config
 })
 
+// Store the token sent back when the permissions it carries changed
+api.interceptors.response.use((response) => {
+    const refreshedToken = response.headers['x-access-token']
+    if (refreshedToken && localStorage.getItem('auth_token')) {
+        localStorage.setItem('auth_token', refreshedToken)
+    }
+    return response
+})
+
 // Handle 401 responses
 api.interceptors.response.use(
     (response) => response,